@@ -7,30 +7,195 @@
 # - flash: Kurzlebige Nachrichten (z.B. "Erfolgreich eingeloggt!") anzeigen.
 # - render_template: Lädt HTML-Dateien (Templates) und schickt sie an den Browser.
 
+import mimetypes                                                                              # Content-Type für vorkomprimierte statische Dateien (vom Original-Dateinamen).
+import os                                                                                     # Für die Anzahl der CPU-Kerne (Passwort-Benchmark) und Umgebungsvariablen.
+import atexit                                                                                 # Um beim Beenden des Prozesses noch gepufferte Likes zu schreiben.
+import hashlib                                                                                # Für den ETag (Prüfsumme) der Produkt-Antwort.
+import json                                                                                   # Die Produkt-Antwort wird einmal als JSON-Text gebaut und dann wiederverwendet.
+import logging                                                                                # Für Log-Meldungen aus Hintergrund-Jobs (z.B. Produkt-Synchronisation).
+import sqlite3                                                                                # Um SQLite-Verbindungen zu erkennen (für die PRAGMA-Einstellungen).
+import threading                                                                              # Für den Hintergrund-Thread, der den Produktkatalog regelmäßig synchronisiert.
+import time                                                                                   # Für Wartezeiten im Hintergrund-Thread und Zeitmessung.
+from collections import deque                                                                 # Warteschlange für die laufenden Seiten-Downloads beim Sync.
+from concurrent.futures import ThreadPoolExecutor                                             # Lädt mehrere Katalog-Seiten parallel (mit Obergrenze).
 from datetime import datetime                                                                 # Importiert 'datetime' für Zeitstempel, z.B. wann ein User registriert wurde.
+from itertools import islice                                                                  # Nimmt die ersten N Elemente eines Iterators.
 from flask import Flask, session, redirect, url_for, request, jsonify, flash, render_template # Wichtige Flask-Module:
+from flask import request_finished, send_from_directory                                       # Signal nach dem Speichern der Session; Dateien aus einem Ordner ausliefern.
 
+import click                                                                                  # Für eigene Kommandozeilen-Befehle ('flask sync-products').
 from flask_sqlalchemy import SQLAlchemy                                                       # Das ist das ORM-Tool, um einfach mit der Datenbank zu sprechen, ohne viel SQL schreiben zu müssen.
+from sqlalchemy import bindparam, case, create_engine, event, inspect, select, text           # event: auf DB-Änderungen reagieren, inspect: vorhandene Spalten prüfen, text: rohes SQL für Migrationen.
+from sqlalchemy.engine import Engine                                                          # Für das 'connect'-Event, das bei jeder neuen DB-Verbindung ausgelöst wird.
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert                                # SQLite-spezifisches INSERT, kann "INSERT ... ON CONFLICT" (Upsert).
+from werkzeug.security import safe_join                                                       # Baut einen Dateipfad, ohne dass man mit '../' aus dem Ordner herauskommt.
 import requests                                                                               # Importiert 'requests', um HTTP-Anfragen an externe APIs zu senden (hier für die Produktdaten).
+from assets import AssetBundler                                                               # Fügt die CSS-Dateien zu einem verkleinerten Bundle mit Prüfsumme zusammen (siehe assets.py).
+from compression import CompressionStats, ENCODINGS, choose_encoding, precompress_folder      # gzip/Brotli für Antworten und statische Dateien (siehe compression.py).
+from catalog import Catalog, CatalogCache                                                     # Eigener Cache für den Produktkatalog (siehe catalog.py).
+from upstream import CircuitBreaker, UpstreamClient                                           # Gemeinsamer HTTP-Client mit Pool, Timeouts und Retries (siehe upstream.py).
+from session_store import CookieSizeTracker, create_session_interface                         # Serverseitige Sessions und Cookie-Größenmessung (siehe session_store.py).
+from fragments import FragmentCache                                                           # Cache für gerenderte Produktkarten (siehe fragments.py).
+from markupsafe import Markup                                                                 # Markiert fertiges HTML als sicher, damit Jinja es nicht nochmal escaped.
+from identity import CachedUser, IdentityCache                                                # Cache für die Daten eingeloggter User (siehe identity.py).
+from like_buffer import LikeWriteBuffer                                                       # Write-Behind-Puffer für Likes/Unlikes (siehe like_buffer.py).
+from passwords import PasswordHasher, PasswordHasherBusy                                      # Passwörter hashen, in einem eigenen Thread-Pool (siehe passwords.py).
 
 # Flask App initialisieren. Das ist quasi der Startpunkt der Anwendung.
 app = Flask(__name__)
 app.secret_key = 'secret_key_project'  # Ein geheimer Schlüssel, super wichtig für sichere Sessions (Cookies). Ohne den könnte jemand Sessions manipulieren.
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'  # Definiert, wo die Datenbank liegt. Hier wird eine einfache SQLite-Datei genutzt.
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///database.db')  # Definiert, wo die Datenbank liegt. Hier wird eine einfache SQLite-Datei genutzt (per 'DATABASE_URL' änderbar, z.B. für Tests).
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False # Eine SQLAlchemy-Einstellung. Deaktiviert das Tracking von Objektänderungen, was die Performance verbessert.
+# SQLite-Einstellungen (PRAGMAs), die für jede neue DB-Verbindung gesetzt werden (leeres Dictionary = SQLite-Standard).
+app.config['SQLITE_PRAGMAS'] = {
+    'busy_timeout': 5000,      # Millisekunden, die auf eine gesperrte DB gewartet wird, statt sofort "database is locked".
+    'journal_mode': 'WAL',     # Write-Ahead-Log: Lesen blockiert Schreiben nicht mehr und umgekehrt.
+    'synchronous': 'NORMAL',   # Mit WAL sicher genug und deutlich schneller als FULL (kein fsync bei jedem Commit).
+    'cache_size': -20000,      # Seiten-Cache pro Verbindung, negativ = in KiB (hier ca. 20 MB).
+    'mmap_size': 268435456,    # Bis zu 256 MB der DB-Datei per Memory-Mapping lesen.
+    'temp_store': 'MEMORY',    # Temporäre Tabellen und Indizes (z.B. beim Sortieren) im Arbeitsspeicher.
+}
+
+app.config['CATALOG_CACHE_TTL'] = 300 # Wie viele Sekunden der Produktkatalog im Speicher gültig bleibt.
+app.config['CATALOG_CACHE_MAX_ENTRIES'] = 32 # Wie viele verschiedene API-URLs maximal gecacht werden.
+app.config['CATALOG_CACHE_MAX_STALE'] = 3600 # Bis zu diesem Alter (Sekunden) wird eine alte Version ausgeliefert und im Hintergrund neu geladen.
+app.config['CATALOG_REFRESH_INTERVAL'] = 240 # Alle X Sekunden lädt ein Hintergrund-Thread den Katalog neu (None = aus).
+app.config['UPSTREAM_POOL_SIZE'] = 10 # Wie viele Keep-Alive-Verbindungen zur externen API offen gehalten werden.
+app.config['UPSTREAM_CONNECT_TIMEOUT'] = 3.05 # Sekunden für den Verbindungsaufbau.
+app.config['UPSTREAM_READ_TIMEOUT'] = 10 # Sekunden, die maximal auf die Antwort gewartet wird.
+app.config['UPSTREAM_RETRIES'] = 2 # Wie oft eine fehlgeschlagene Anfrage wiederholt wird.
+app.config['UPSTREAM_BACKOFF'] = 0.3 # Backoff-Faktor für die Wartezeit zwischen den Wiederholungen.
+app.config['CIRCUIT_FAILURE_THRESHOLD'] = 0.5 # Ab dieser Fehlerquote (50%) wird die externe API abgeschaltet.
+app.config['CIRCUIT_WINDOW'] = 20 # Wie viele der letzten Aufrufe für die Fehlerquote zählen.
+app.config['CIRCUIT_MIN_CALLS'] = 5 # Mindestanzahl Aufrufe, bevor die Fehlerquote überhaupt zählt.
+app.config['CIRCUIT_COOLDOWN'] = 30 # Sekunden, bis nach dem Abschalten wieder ein Testaufruf versucht wird.
+app.config['LIKE_SNAPSHOT_MAX_AGE'] = 86400 # Nach so vielen Sekunden gilt die Produkt-Kopie in einem Like als veraltet und wird aufgefrischt.
+app.config['LIKE_SNAPSHOT_REFRESH_INTERVAL'] = 3600 # Alle X Sekunden frischt ein Hintergrund-Job veraltete Produkt-Kopien auf (None = aus).
+app.config['LIKE_SNAPSHOT_BATCH_SIZE'] = 500 # Wie viele Produkte der Job pro Durchlauf höchstens auffrischt.
+app.config['ASSET_BUNDLES'] = { # Welche CSS-Dateien (in dieser Reihenfolge) zu welchem Bundle zusammengefügt werden.
+    'bundle.css': ['basic_style.css', 'home_style.css', 'index_style.css', 'l_r_style.css', 'nav_bar_style.css',
+                   'profile_style.css', 'flash_style.css', 'favorites_style.css'],
+}
+app.config['ASSET_BUILD_ON_STARTUP'] = os.environ.get('ASSET_BUILD_ON_STARTUP', '1') != '0' # Bundles beim Start bauen (sonst von Hand mit 'flask build-assets'). Mit ASSET_BUILD_ON_STARTUP=0 aus.
+app.config['ASSET_BUNDLE_MAX_AGE'] = 31536000 # Sekunden (1 Jahr), die Browser ein Bundle cachen dürfen. Der Name ändert sich ja mit dem Inhalt.
+app.config['COMPRESS_ENABLED'] = True # Antworten komprimieren (gzip, mit installiertem 'brotli'-Paket auch Brotli).
+app.config['COMPRESS_MIN_SIZE'] = 1024 # Dynamische Antworten erst ab dieser Größe (Bytes) komprimieren.
+app.config['COMPRESS_LEVEL'] = 6 # Kompressionsstufe für dynamische Antworten (1 = schnell, 9 = klein).
+app.config['COMPRESS_MIMETYPES'] = ['text/html', 'application/json', 'text/css', 'application/javascript'] # Welche Antworten komprimiert werden.
+app.config['PRECOMPRESS_STATIC_ON_STARTUP'] = os.environ.get('PRECOMPRESS_STATIC_ON_STARTUP', '1') != '0' # Beim Start komprimierte Kopien (.gz/.br) der statischen Dateien anlegen. Mit PRECOMPRESS_STATIC_ON_STARTUP=0 aus.
+app.config['USER_PAGE_ETAGS'] = True # '/profile' und '/favorites' mit ETag ausliefern und bei unverändertem Stand mit 304 antworten.
+app.config['PRODUCTS_API_MAX_AGE'] = 60 # Sekunden, die Browser die Antwort von '/api/products' ohne Nachfrage benutzen dürfen.
+app.config['PRODUCT_SYNC_INTERVAL'] = 3600 # Alle X Sekunden wird der lokale Produktkatalog mit der API abgeglichen (None = aus).
+app.config['PRODUCT_SYNC_PAGE_SIZE'] = 100 # Wie viele Produkte pro API-Aufruf beim Synchronisieren geholt werden.
+app.config['PRODUCT_SYNC_CONCURRENCY'] = 4 # Wie viele Seiten beim Synchronisieren maximal gleichzeitig geladen werden.
+app.config['SESSION_BACKEND'] = 'sqlite' # Wo Session-Daten liegen: 'sqlite' (DB), 'redis', 'compact' (komprimiert im Cookie) oder 'cookie' (Flask-Standard).
+app.config['SESSION_PURGE_INTERVAL'] = 300 # Alle X Sekunden werden abgelaufene Sessions aus 'session_store' gelöscht (None = nie).
+app.config['SESSION_COOKIE_BUDGET'] = 3072 # Ab dieser Größe (Bytes) eines Set-Cookie-Headers wird eine Warnung geloggt.
+app.config['IDENTITY_CACHE_TTL'] = 60 # Sekunden, die User-Daten im Speicher bleiben, bevor sie neu aus der DB geladen werden.
+app.config['IDENTITY_CACHE_MAX_ENTRIES'] = 1024 # Wie viele User maximal im Speicher gehalten werden.
+app.config['FRAGMENT_CACHE_MAX_ENTRIES'] = 2048 # Wie viele gerenderte Produktkarten maximal im Speicher gehalten werden.
+app.config['FRAGMENT_CACHE_MAX_BYTES'] = 4 * 1024 * 1024 # Wie viel HTML (Bytes) der Karten-Cache insgesamt höchstens belegt.
+app.config['SESSION_REDIS_URL'] = None # Nur für 'redis': z.B. 'redis://localhost:6379/0'. Ohne URL wird ein Ersatz im Arbeitsspeicher benutzt.
+app.config['LIKE_WRITE_BEHIND'] = False # True = Likes/Unlikes erst puffern und gesammelt schreiben (ein Commit für viele Klicks).
+app.config['LIKE_WRITE_BEHIND_MAX_DELAY'] = 0.2 # Spätestens nach so vielen Sekunden werden gepufferte Likes geschrieben.
+app.config['LIKE_WRITE_BEHIND_MAX_BATCH'] = 500 # Ab so vielen gepufferten Änderungen wird sofort geschrieben.
+app.config['LIKE_BATCH_MAX_OPERATIONS'] = 200 # Wie viele Likes/Unlikes ein Aufruf von '/api/likes/batch' höchstens enthalten darf.
+app.config['PASSWORD_HASH_ALGORITHM'] = 'scrypt' # Verfahren für neue Passwort-Hashes: 'scrypt' oder 'pbkdf2_sha256'.
+app.config['PASSWORD_SCRYPT_N'] = 2 ** 14 # scrypt-Kosten (CPU/Speicher). Höher = sicherer, aber langsamer. Alte Hashes werden beim Login erneuert.
+app.config['PASSWORD_SCRYPT_R'] = 8 # scrypt-Blockgröße.
+app.config['PASSWORD_SCRYPT_P'] = 1 # scrypt-Parallelität.
+app.config['PASSWORD_PBKDF2_ITERATIONS'] = 600000 # Anzahl Durchläufe für 'pbkdf2_sha256'.
+app.config['PASSWORD_HASH_WORKERS'] = 2 # Wie viele Passwörter gleichzeitig gehasht werden (höchstens so viele CPU-Kerne werden belegt).
+app.config['PASSWORD_HASH_MAX_PENDING'] = 16 # Wie viele Logins gleichzeitig hashen oder warten dürfen, danach wird abgelehnt.
+
+# Adresse der externen Produkt-API (DummyJSON).
+PRODUCTS_API = "https://dummyjson.com/products"
+PRODUCTS_URL = PRODUCTS_API + "?limit=0" # limit=0 liefert bei DummyJSON den kompletten Katalog.
+PRODUCT_SYNC_FIELDS = "title,description,thumbnail,price,category,rating" # Felder, die der Sync abfragt ('id' kommt immer mit).
+PRODUCT_CARD_FIELDS = ("id", "title", "description", "thumbnail") # Felder, die eine Produktkarte auf der Home-Seite braucht.
+
+logger = logging.getLogger(__name__)
 
 # Datenbank-Objekt erstellen und mit der Flask-App verbinden.
 db = SQLAlchemy(app)
 
 
+# Wird bei jeder neuen Datenbank-Verbindung aufgerufen und setzt die PRAGMAs aus SQLITE_PRAGMAS.
+# PRAGMAs gelten (bis auf journal_mode) nur für die jeweilige Verbindung, deshalb hier und nicht einmal beim Start.
+@event.listens_for(Engine, 'connect')
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return # Andere Datenbanken (z.B. Postgres) nicht anfassen.
+    cursor = dbapi_connection.cursor()
+    for name, value in app.config['SQLITE_PRAGMAS'].items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+# HTTP-Client für alle serverseitigen Anfragen an die externe API.
+upstream = UpstreamClient(pool_size=app.config['UPSTREAM_POOL_SIZE'],
+                          connect_timeout=app.config['UPSTREAM_CONNECT_TIMEOUT'],
+                          read_timeout=app.config['UPSTREAM_READ_TIMEOUT'],
+                          retries=app.config['UPSTREAM_RETRIES'],
+                          backoff=app.config['UPSTREAM_BACKOFF'],
+                          breaker=CircuitBreaker(failure_threshold=app.config['CIRCUIT_FAILURE_THRESHOLD'],
+                                                 window=app.config['CIRCUIT_WINDOW'],
+                                                 min_calls=app.config['CIRCUIT_MIN_CALLS'],
+                                                 cooldown=app.config['CIRCUIT_COOLDOWN']))
+
+# Session-Daten auf dem Server speichern, im Cookie steht dann nur noch eine signierte Session-ID.
+session_interface = create_session_interface(app.config['SESSION_BACKEND'], lambda: db.engine, app.config['SESSION_REDIS_URL'],
+                                             app.config['SESSION_PURGE_INTERVAL'])
+if session_interface is not None:
+    app.session_interface = session_interface
+
+# Misst bei jeder Antwort die Größe der gesetzten Cookies (siehe record_cookie_size() unten).
+cookie_sizes = CookieSizeTracker(budget=app.config['SESSION_COOKIE_BUDGET'])
+
+# Cache für die Daten eingeloggter User, damit nicht jede Anfrage den User aus der DB lesen muss.
+identity_cache = IdentityCache(ttl=app.config['IDENTITY_CACHE_TTL'], max_entries=app.config['IDENTITY_CACHE_MAX_ENTRIES'])
+
+# Cache für gerenderte Produktkarten (Favoriten-Seite), für alle User gemeinsam.
+fragment_cache = FragmentCache(max_entries=app.config['FRAGMENT_CACHE_MAX_ENTRIES'],
+                               max_bytes=app.config['FRAGMENT_CACHE_MAX_BYTES'])
+
+# Hasht und prüft Passwörter in einem eigenen, begrenzten Thread-Pool, damit Logins nicht alle Worker blockieren.
+password_hasher = PasswordHasher(algorithm=app.config['PASSWORD_HASH_ALGORITHM'],
+                                 scrypt_n=app.config['PASSWORD_SCRYPT_N'],
+                                 scrypt_r=app.config['PASSWORD_SCRYPT_R'],
+                                 scrypt_p=app.config['PASSWORD_SCRYPT_P'],
+                                 pbkdf2_iterations=app.config['PASSWORD_PBKDF2_ITERATIONS'],
+                                 workers=app.config['PASSWORD_HASH_WORKERS'],
+                                 max_pending=app.config['PASSWORD_HASH_MAX_PENDING'])
+
+# Bundles für die Stylesheets. 'asset_url()' in den Templates liefert die URL mit Prüfsumme.
+assets = AssetBundler(app.static_folder, app.config['ASSET_BUNDLES'])
+if app.config['ASSET_BUILD_ON_STARTUP']:
+    assets.build()
+
+# Komprimierung: Messwerte und (einmalig beim Start) fertig komprimierte Kopien der statischen Dateien.
+compression_stats = CompressionStats()
+if app.config['PRECOMPRESS_STATIC_ON_STARTUP']:
+    precompress_folder(app.static_folder)
+
+# Cache für den Produktkatalog. Wird von 'favorites()' benutzt, damit nicht jeder Seitenaufruf die API fragt.
+catalog_cache = CatalogCache(ttl=app.config['CATALOG_CACHE_TTL'],
+                             max_entries=app.config['CATALOG_CACHE_MAX_ENTRIES'],
+                             max_stale=app.config['CATALOG_CACHE_MAX_STALE'])
+
+
 # Datenbankmodell für User-Accounts. Jede Zeile in der 'db_user'-Tabelle ist ein User.
 class db_user(db.Model):
     _id = db.Column(db.Integer, primary_key=True) # Eindeutige ID für jeden User, wird automatisch vergeben.
     username = db.Column(db.String(150), unique=True, nullable=False) # Benutzername, muss einzigartig sein und darf nicht leer sein.
-    password = db.Column(db.String(150), nullable=False)  # Passwort, darf nicht leer sein. WICHTIG: In echten Apps würde man Passwörter HASHEN!
+    password = db.Column(db.String(255), nullable=False)  # Passwort-Hash (siehe passwords.py), darf nicht leer sein. Alte Klartext-Passwörter werden beim Login umgestellt.
     email = db.Column(db.String(150), unique=True, nullable=False) # E-Mail, muss auch einzigartig sein und darf nicht leer sein.
     creation = db.Column(db.DateTime, default=datetime.now)  # Zeitstempel, wann der User erstellt wurde. Standard ist die aktuelle Zeit.
     country = db.Column(db.String(150), nullable=True) # Land des Users, ist optional.
+    version = db.Column(db.Integer, nullable=False, default=1) # Wird bei jeder Änderung automatisch hochgezählt (für den Identity-Cache).
+    likes_version = db.Column(db.Integer, nullable=False, default=0, server_default="0") # Wird bei jeder Änderung an den Likes hochgezählt (für die ETags, siehe bump_likes_version()).
+
+    # SQLAlchemy zählt 'version' bei jedem UPDATE selbst hoch.
+    __mapper_args__ = {"version_id_col": version}
 
     # Konstruktor: Wird aufgerufen, wenn ein neuer User erstellt wird.
     def __init__(self, username, password, email, country):
@@ -40,11 +205,719 @@ class db_user(db.Model):
         self.country = country
 
 
+# Wenn sich ein User in der DB ändert oder gelöscht wird: aus dem Identity-Cache dieses Prozesses entfernen.
+# Andere Prozesse merken die Änderung über die Versionsnummer in der Session - wer einen User ändert,
+# sollte deshalb danach session['user_version'] = user.version setzen.
+@event.listens_for(db_user, 'after_update')
+@event.listens_for(db_user, 'after_delete')
+def invalidate_cached_user(mapper, connection, target):
+    identity_cache.invalidate(username=target.username, user_id=target._id)
+
+
 # Datenbankmodell für gelikte Produkte. Speichert, welcher User welches Produkt mag.
 class db_liked_product(db.Model):
+    # Zusammengesetzte, eindeutige Indizes: Jeder User kann jedes Produkt nur einmal liken.
+    # Gleichzeitig machen sie alle Abfragen "alle Likes von username" bzw. "Like von username für Produkt X" schnell,
+    # statt jedes Mal die ganze Tabelle zu durchsuchen.
+    __table_args__ = (
+        db.Index('ux_db_liked_product_username_product', 'username', 'product', unique=True),
+        db.Index('ux_db_liked_product_username_product_id', 'username', 'product_id', unique=True),
+        # Abfragen nur über das Produkt (z.B. "alle Likes von Produkt X" beim Auffrischen der Kopien) können die
+        # Indizes oben nicht benutzen, weil sie mit 'username' beginnen.
+        db.Index('ix_db_liked_product_product_id', 'product_id'),
+        db.Index('ix_db_liked_product_snapshot_at', 'snapshot_at'), # Damit der Auffrisch-Job veraltete Kopien schnell findet.
+    )
+
     _id = db.Column(db.Integer, primary_key=True)                       # Eindeutige ID für jeden "Like"-Eintrag.
     username = db.Column(db.String(150), nullable=False)                # Der User, der das Produkt gelikt hat.
-    product = db.Column(db.String(150), nullable=False)                 # Der Name des gelikten Produkts.
+    product = db.Column(db.String(150), nullable=False)                 # Der Name des gelikten Produkts (nur noch zur Anzeige).
+    product_id = db.Column(db.Integer, nullable=True)                   # ID des Produkts aus der API. Darüber wird verglichen und gesucht.
+    # Kopie der Produktdaten zum Zeitpunkt des Likes ("Snapshot"). Damit kann die Favoriten-Seite ohne die externe API
+    # angezeigt werden. Ein Hintergrund-Job frischt veraltete Kopien auf (siehe refresh_like_snapshots()).
+    thumbnail = db.Column(db.String(300), nullable=True)                # URL des Vorschaubilds.
+    description = db.Column(db.Text, nullable=True)                     # Beschreibung.
+    price = db.Column(db.Float, nullable=True)                          # Preis.
+    snapshot_version = db.Column(db.Integer, nullable=False, default=1) # Wird hochgezählt, wenn sich die Kopie beim Auffrischen ändert.
+    snapshot_at = db.Column(db.DateTime, nullable=True)                 # Wann die Kopie zuletzt mit dem Katalog abgeglichen wurde (None = noch nie).
+
+
+# Zählt 'likes_version' der User hoch, deren Likes sich geändert haben (ein UPDATE, executemany).
+# Als einfaches UPDATE an SQLAlchemys Versionszählung vorbei: 'version' und der Identity-Cache bleiben unberührt.
+# Ohne Commit - wird in derselben Transaktion wie die Änderung an den Likes geschrieben.
+def bump_likes_version(usernames):
+    usernames = sorted(set(usernames))
+    if usernames:
+        table = db_user.__table__
+        db.session.execute(table.update().where(table.c.username == bindparam('b_username'))
+                           .values(likes_version=table.c.likes_version + 1),
+                           [{"b_username": username} for username in usernames])
+
+
+# Die Spalten für die Produkt-Kopie in einem Like, aus einem Produkt-Dictionary (Katalog).
+# Ist das Produkt nicht bekannt, wird nur der Titel gespeichert und der Auffrisch-Job holt den Rest nach.
+def like_snapshot(product, title=None):
+    if product is None:
+        return {"product": title, "thumbnail": None, "description": None, "price": None, "snapshot_at": None}
+    return {
+        "product": product["title"],
+        "thumbnail": product.get("thumbnail"),
+        "description": product.get("description"),
+        "price": product.get("price"),
+        "snapshot_at": datetime.now(),
+    }
+
+
+# Schreibt gepufferte Likes/Unlikes (username, product_id, title, liked) in EINER Transaktion:
+# ein "INSERT ... ON CONFLICT DO NOTHING" für alle Likes und ein DELETE für alle Unlikes (jeweils executemany).
+# Neue Likes bekommen dabei die Produkt-Kopie aus dem Katalog (aus dem Cache, keine API-Anfrage pro Like).
+def write_like_batch(events):
+    deletes = [{"b_username": username, "b_product_id": product_id}
+               for username, product_id, title, liked in events if not liked]
+    with app.app_context():
+        inserts = [{"username": username, "product_id": product_id,
+                    **like_snapshot(lookup_product(product_id=product_id), title)}
+                   for username, product_id, title, liked in events if liked]
+        if inserts:
+            db.session.execute(sqlite_insert(db_liked_product).on_conflict_do_nothing(), inserts)
+        if deletes:
+            db.session.execute(db_liked_product.__table__.delete().where(
+                db_liked_product.username == bindparam('b_username'),
+                db_liked_product.product_id == bindparam('b_product_id')), deletes)
+        bump_likes_version(username for username, product_id, title, liked in events)
+        db.session.commit()
+
+
+# Optionaler Write-Behind-Puffer (LIKE_WRITE_BEHIND). None = jeder Klick wird sofort gespeichert.
+like_buffer = None
+if app.config['LIKE_WRITE_BEHIND']:
+    like_buffer = LikeWriteBuffer(write_like_batch,
+                                  max_batch=app.config['LIKE_WRITE_BEHIND_MAX_BATCH'],
+                                  max_delay=app.config['LIKE_WRITE_BEHIND_MAX_DELAY'])
+    atexit.register(like_buffer.close) # Beim Beenden den Rest schreiben.
+
+
+# Alle Likes eines Users - aus der DB plus die noch gepufferten Änderungen, damit der User seine Klicks sofort sieht.
+# Gibt weiter: Liste von Objekten mit 'product_id' und 'product' (Titel).
+def load_likes(username):
+    likes = db_liked_product.query.filter_by(username=username).all()
+    if like_buffer is not None:
+        likes = like_buffer.overlay(username, likes)
+    return likes
+
+
+# Lokale Kopie des Produktkatalogs der externen API. Wird vom Sync-Job befüllt (siehe sync_products()),
+# damit die Seiten nicht bei jedem Aufruf auf dummyjson.com angewiesen sind.
+class db_product(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)   # ID aus der externen API (keine eigene).
+    title = db.Column(db.String(150), nullable=False, index=True)       # Produktname, mit Index für schnelle Suche.
+    description = db.Column(db.Text, nullable=True)                     # Beschreibung.
+    thumbnail = db.Column(db.String(300), nullable=True)                # URL des Vorschaubilds.
+    price = db.Column(db.Float, nullable=True)                          # Preis.
+    category = db.Column(db.String(100), nullable=True, index=True)     # Kategorie, mit Index für Filter.
+    rating = db.Column(db.Float, nullable=True)                         # Bewertung.
+    updated_at = db.Column(db.DateTime, default=datetime.now, index=True) # Wann der Eintrag zuletzt synchronisiert wurde.
+
+    # Wandelt das Produkt in ein Dictionary um - im selben Format wie die externe API, damit die Templates gleich bleiben.
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "title": self.title,
+            "description": self.description,
+            "thumbnail": self.thumbnail,
+            "price": self.price,
+            "category": self.category,
+            "rating": self.rating,
+        }
+
+
+# Checkpoint für den Sync-Job: Wie weit ist der aktuelle Lauf gekommen? Damit kann ein abgebrochener Lauf weitermachen.
+class db_sync_state(db.Model):
+    name = db.Column(db.String(50), primary_key=True)           # Name des Jobs, z.B. 'products'.
+    next_skip = db.Column(db.Integer, nullable=False, default=0) # Ab dieser Position geht es beim nächsten Lauf weiter.
+    started_at = db.Column(db.DateTime, nullable=True)          # Wann der aktuelle Lauf begonnen hat.
+    finished_at = db.Column(db.DateTime, nullable=True)         # Wann zuletzt ein Lauf fertig war (None = noch nie). Älter als started_at = Lauf noch nicht fertig.
+
+
+# Lädt die Produkte direkt von der externen API (ohne Cache), über den gemeinsamen Upstream-Client.
+# Wirft eine requests-Exception, wenn die API nicht erreichbar ist oder einen Fehlerstatus liefert.
+def fetch_products(url):
+    return upstream.get_json(url).get("products", []) # JSON parsen und Produkte holen.
+
+
+# Lädt den Produktkatalog: aus der lokalen Tabelle 'db_product', sobald der Sync-Job sie einmal komplett
+# befüllt hat, sonst von der API. Ein abgebrochener oder noch laufender erster Sync hinterlässt nur einen Teil
+# der Produkte - der würde sonst als ganzer Katalog ausgeliefert.
+# Läuft evtl. in einem Hintergrund-Thread (Cache-Refresh), deshalb mit eigenem App-Kontext.
+# Gibt weiter: ein Catalog-Objekt (Produktliste plus Nachschlage-Tabellen nach ID und Titel).
+def load_catalog():
+    with app.app_context():
+        state = db.session.get(db_sync_state, 'products')
+        if state is not None and state.finished_at is not None:
+            local_products = db_product.query.order_by(db_product.id).all()
+            if local_products:
+                return Catalog([product.to_dict() for product in local_products])
+    return Catalog(fetch_products(PRODUCTS_URL))
+
+
+# Liefert den Produktkatalog (Catalog-Objekt) - aus dem Cache, oder (wenn abgelaufen) frisch geladen.
+def get_catalog():
+    return catalog_cache.get(PRODUCTS_URL, load_catalog)
+
+
+# Sucht ein Produkt im Katalog - über die ID oder (wenn keine ID da ist) über den Titel.
+# Ist die API gerade nicht erreichbar, wird der letzte bekannte Katalog benutzt.
+# Gibt weiter: das Produkt-Dictionary oder None, wenn es nicht gefunden wurde.
+def lookup_product(product_id=None, title=None):
+    try:
+        catalog = get_catalog()
+    except requests.exceptions.RequestException:
+        catalog = catalog_cache.last_known(PRODUCTS_URL)
+        if catalog is None:
+            return None
+    if product_id is not None:
+        return catalog.by_id.get(product_id)
+    return catalog.by_title.get(title)
+
+
+# Migration für bestehende Datenbanken: db.create_all() legt nur neue Tabellen an, aber keine neuen Spalten oder Indizes.
+# - Fügt 'db_user.version', 'db_user.likes_version' und 'db_liked_product.product_id' hinzu, falls die Spalten fehlen.
+# - Füllt fehlende product_id-Werte über den Titel aus dem Produktkatalog nach.
+#   Ist der Katalog nicht erreichbar, bleiben die Werte leer und werden beim nächsten Start nachgefüllt.
+# - Legt die eindeutigen Indizes (username, product) und (username, product_id) sowie die übrigen Indizes an.
+#   Vorher werden doppelte Likes gelöscht (der älteste Eintrag bleibt), sonst ließe sich der Index nicht anlegen.
+def migrate_database():
+    user_columns = {column["name"] for column in inspect(db.engine).get_columns("db_user")}
+    if "version" not in user_columns:
+        db.session.execute(text("ALTER TABLE db_user ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+        db.session.commit()
+    if "likes_version" not in user_columns:
+        db.session.execute(text("ALTER TABLE db_user ADD COLUMN likes_version INTEGER NOT NULL DEFAULT 0"))
+        db.session.commit()
+
+    columns = {column["name"] for column in inspect(db.engine).get_columns("db_liked_product")}
+    if "product_id" not in columns:
+        db.session.execute(text("ALTER TABLE db_liked_product ADD COLUMN product_id INTEGER"))
+        db.session.commit()
+    # Spalten für die Produkt-Kopie. Bestehende Likes haben noch keine (snapshot_at = NULL), der Auffrisch-Job füllt sie.
+    snapshot_columns = {
+        "thumbnail": "VARCHAR(300)",
+        "description": "TEXT",
+        "price": "FLOAT",
+        "snapshot_version": "INTEGER NOT NULL DEFAULT 0",
+        "snapshot_at": "DATETIME",
+    }
+    for name, column_type in snapshot_columns.items():
+        if name not in columns:
+            db.session.execute(text(f"ALTER TABLE db_liked_product ADD COLUMN {name} {column_type}"))
+    db.session.commit()
+
+    backfill_liked_product_ids()
+
+    indexes = {index["name"] for index in inspect(db.engine).get_indexes("db_liked_product")}
+    if "ux_db_liked_product_username_product" not in indexes:
+        db.session.execute(text(
+            "DELETE FROM db_liked_product WHERE _id NOT IN "
+            "(SELECT MIN(_id) FROM db_liked_product GROUP BY username, product)"))
+    if "ux_db_liked_product_username_product_id" not in indexes:
+        db.session.execute(text(
+            "DELETE FROM db_liked_product WHERE product_id IS NOT NULL AND _id NOT IN "
+            "(SELECT MIN(_id) FROM db_liked_product WHERE product_id IS NOT NULL GROUP BY username, product_id)"))
+    db.session.commit()
+    for index in db_liked_product.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+
+# Füllt fehlende product_id-Werte über den Titel aus dem Katalog nach.
+# Gibt es für den User schon ein Like mit derselben ID, ist der Eintrag doppelt und wird gelöscht.
+def backfill_liked_product_ids():
+    missing = db_liked_product.query.filter(db_liked_product.product_id.is_(None)).all()
+    if not missing:
+        return
+    try:
+        catalog = get_catalog()
+    except requests.exceptions.RequestException:
+        logger.warning("Produkt-IDs konnten nicht nachgefüllt werden (Katalog nicht erreichbar)")
+        return
+    taken = set(db.session.query(db_liked_product.username, db_liked_product.product_id)
+                .filter(db_liked_product.product_id.isnot(None)).all())
+    for like in missing:
+        product = catalog.by_title.get(like.product)
+        if not product:
+            continue
+        if (like.username, product["id"]) in taken:
+            db.session.delete(like)
+        else:
+            like.product_id = product["id"]
+            taken.add((like.username, product["id"]))
+    bump_likes_version(like.username for like in missing)
+    db.session.commit()
+
+
+# Kommandozeilen-Befehl: 'flask --app app migrate-db' legt fehlende Tabellen/Spalten an und füllt Produkt-IDs nach.
+@app.cli.command('migrate-db')
+def migrate_db_command():
+    db.create_all()
+    migrate_database()
+    click.echo("Datenbank migriert.")
+
+
+# Kommandozeilen-Befehl: 'flask --app app like-index-benchmark'
+# Misst die typischen Like-Abfragen ("alle Likes von username", "Like von username für Produkt X") auf einer
+# großen Tabelle, einmal ohne und einmal mit den Indizes von db_liked_product. Läuft auf einer eigenen
+# SQLite-Datenbank im Arbeitsspeicher, die echte Datenbank bleibt unberührt.
+@app.cli.command('like-index-benchmark')
+@click.option('--rows', type=int, default=1000000, help='Anzahl Likes in der Test-Tabelle.')
+@click.option('--users', type=int, default=10000, help='Auf wie viele User die Likes verteilt werden.')
+@click.option('--queries', type=int, default=50, help='Wie viele Abfragepaare pro Messung.')
+def like_index_benchmark_command(rows, users, queries):
+    engine = create_engine("sqlite://")
+    table = db_liked_product.__table__
+    table.create(engine)
+    with engine.begin() as connection:
+        for index in table.indexes:
+            connection.execute(text(f"DROP INDEX {index.name}"))
+        for offset in range(0, rows, 50000): # In Blöcken einfügen, damit nicht alle Zeilen gleichzeitig im Speicher sind.
+            connection.execute(table.insert(), [
+                {"username": f"user{i % users}", "product": f"Produkt {i}", "product_id": i}
+                for i in range(offset, min(offset + 50000, rows))])
+
+    def measure():
+        with engine.connect() as connection:
+            start = time.perf_counter()
+            for q in range(queries):
+                number = (q * 7919) % min(users, rows)
+                connection.execute(text("SELECT _id, product_id FROM db_liked_product WHERE username = :username"),
+                                   {"username": f"user{number}"}).all()
+                connection.execute(text("SELECT _id FROM db_liked_product WHERE username = :username AND product_id = :product_id"),
+                                   {"username": f"user{number}", "product_id": number}).first()
+            return (time.perf_counter() - start) / queries * 1000
+
+    without_indexes = measure()
+    with engine.begin() as connection:
+        for index in table.indexes:
+            index.create(connection)
+    with_indexes = measure()
+    click.echo(f"{rows} Likes, {users} User: {without_indexes:.2f} ms ohne Indizes, {with_indexes:.3f} ms mit Indizes "
+               f"(pro Abfragepaar, Durchschnitt aus {queries}).")
+
+
+# Kommandozeilen-Befehl: 'flask --app app like-benchmark'
+# Misst, wie viele Likes pro Sekunde gespeichert werden, wenn mehrere Threads gleichzeitig schreiben
+# (jedes Like ein eigener Commit, wie in 'like()'). Die Test-Likes werden danach wieder gelöscht.
+# Mit '--write-behind' gehen die Likes stattdessen durch einen LikeWriteBuffer (gemessen bis alles geschrieben ist).
+@app.cli.command('like-benchmark')
+@click.option('--threads', type=int, default=4, help='Wie viele Threads gleichzeitig schreiben.')
+@click.option('--likes', type=int, default=200, help='Likes pro Thread.')
+@click.option('--write-behind', is_flag=True, help='Likes puffern und gesammelt schreiben.')
+def like_benchmark_command(threads, likes, write_behind):
+    db.create_all()
+    errors = []
+    buffer = None
+    if write_behind:
+        buffer = LikeWriteBuffer(write_like_batch, max_batch=app.config['LIKE_WRITE_BEHIND_MAX_BATCH'],
+                                 max_delay=app.config['LIKE_WRITE_BEHIND_MAX_DELAY'])
+
+    def writer(number):
+        with app.app_context():
+            for i in range(likes):
+                if buffer is not None:
+                    buffer.add(f"__benchmark_{number}", -(i + 1), f"Benchmark {i}", True)
+                    continue
+                try:
+                    db.session.execute(
+                        sqlite_insert(db_liked_product)
+                        .values(username=f"__benchmark_{number}", product=f"Benchmark {i}", product_id=-(i + 1))
+                        .on_conflict_do_nothing()
+                    )
+                    db.session.commit()
+                except Exception as e: # z.B. "database is locked"
+                    db.session.rollback()
+                    errors.append(e)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(writer, range(threads)))
+    if buffer is not None:
+        buffer.close() # Wartet, bis alles geschrieben ist.
+        errors.extend([None] * buffer.stats()["pending"])
+    seconds = time.perf_counter() - start
+
+    db_liked_product.query.filter(db_liked_product.username.startswith("__benchmark_", autoescape=True)).delete()
+    db.session.commit()
+    journal_mode = db.session.execute(text("PRAGMA journal_mode")).scalar()
+    saved = threads * likes - len(errors)
+    click.echo(f"{saved} Likes mit {threads} Threads in {seconds:.2f} s: {saved / seconds:.0f} Likes/s "
+               f"(journal_mode={journal_mode}, {len(errors)} Fehler).")
+    if buffer is not None:
+        click.echo(f"Write-Behind: {buffer.flushes} Commits, durchschnittlich {buffer.stats()['avg_batch']} Likes pro Commit.")
+
+
+# Holt eine Seite des Katalogs von der API. Mit 'select' nur die Felder, die wir speichern (kleinere Antworten).
+def fetch_product_page(skip, page_size):
+    return upstream.get_json(PRODUCTS_API, params={"limit": page_size, "skip": skip, "select": PRODUCT_SYNC_FIELDS})
+
+
+# Speichert eine Seite Produkte per Upsert in 'db_product': vorhandene IDs werden überschrieben, neue eingefügt.
+def store_product_page(products):
+    rows = [{
+        "id": product["id"],
+        "title": product["title"],
+        "description": product.get("description"),
+        "thumbnail": product.get("thumbnail"),
+        "price": product.get("price"),
+        "category": product.get("category"),
+        "rating": product.get("rating"),
+        "updated_at": datetime.now(),
+    } for product in products]
+    insert = sqlite_insert(db_product).values(rows)
+    db.session.execute(insert.on_conflict_do_update(
+        index_elements=[db_product.id],
+        set_={column: insert.excluded[column] for column in rows[0] if column != "id"},
+    ))
+
+
+# Sync-Job: Holt den kompletten Katalog seitenweise (limit/skip) von der API und speichert ihn in 'db_product'.
+# - Die Seiten werden parallel geladen, aber höchstens 'concurrency' gleichzeitig (schont die API).
+# - Jede Seite wird sofort gespeichert und danach ein Checkpoint in 'db_sync_state' geschrieben.
+#   Bricht der Job ab (z.B. API-Fehler), macht der nächste Lauf an dieser Stelle weiter statt von vorne.
+# - 'finished_at' bleibt während eines neuen Laufs auf dem letzten fertigen Lauf stehen: Die Tabelle ist dann
+#   (bis auf die gerade aktualisierten Seiten) vollständig und darf weiter benutzt werden (siehe load_catalog()).
+# - Produkte, die es in der API nicht mehr gibt, werden am Ende gelöscht.
+# Gibt weiter: Dictionary mit Anzahl Produkte, Gesamtzahl laut API, Dauer und Durchsatz (Produkte pro Sekunde).
+def sync_products(page_size=None, concurrency=None):
+    page_size = page_size or app.config['PRODUCT_SYNC_PAGE_SIZE']
+    concurrency = concurrency or app.config['PRODUCT_SYNC_CONCURRENCY']
+    clock = time.perf_counter()
+
+    state = db.session.get(db_sync_state, 'products')
+    if state is None:
+        state = db_sync_state(name='products')
+        db.session.add(state)
+    if state.started_at is None or (state.finished_at is not None and state.finished_at >= state.started_at):
+        # Neuer Lauf. Alles, was danach nicht aktualisiert wurde, gibt es upstream nicht mehr.
+        state.started_at = datetime.now()
+        state.next_skip = 0
+        db.session.commit()
+
+    count = 0
+
+    # Speichert eine Seite und setzt den Checkpoint: bis hierhin ist alles gespeichert.
+    def save(skip, products):
+        nonlocal count
+        if products:
+            store_product_page(products)
+            count += len(products)
+        state.next_skip = skip + page_size
+        db.session.commit()
+
+    # Erste Seite (ab dem Checkpoint) holen, die Antwort verrät auch, wie viele Produkte es insgesamt gibt.
+    first = fetch_product_page(state.next_skip, page_size)
+    total = first.get("total", 0)
+    remaining = iter(range(state.next_skip + page_size, total, page_size))
+    save(state.next_skip, first.get("products", []))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # Immer nur 'concurrency' Seiten gleichzeitig anfragen und in der richtigen Reihenfolge speichern,
+        # damit der Checkpoint immer das Ende eines lückenlosen Blocks ist.
+        pending = deque((skip, pool.submit(fetch_product_page, skip, page_size)) for skip in islice(remaining, concurrency))
+        while pending:
+            skip, future = pending.popleft()
+            products = future.result().get("products", [])
+            next_skip = next(remaining, None)
+            if next_skip is not None:
+                pending.append((next_skip, pool.submit(fetch_product_page, next_skip, page_size)))
+            save(skip, products)
+
+    if total:
+        db_product.query.filter(db_product.updated_at < state.started_at).delete() # Verschwundene Produkte entfernen.
+    state.finished_at = datetime.now()
+    db.session.commit()
+    catalog_cache.invalidate(PRODUCTS_URL) # Beim nächsten Zugriff den neuen Stand aus der DB lesen.
+
+    seconds = time.perf_counter() - clock
+    return {
+        "products": count,
+        "total": total,
+        "seconds": round(seconds, 3),
+        "per_second": round(count / seconds, 1) if seconds else None,
+    }
+
+
+# Frischt die Produkt-Kopien in den Likes auf, die älter als 'max_age' Sekunden sind (oder noch gar keine haben).
+# Pro Produkt (nicht pro Like) ein UPDATE, alle zusammen als executemany in einer Transaktion.
+# 'snapshot_version' wird nur hochgezählt, wenn sich an der Kopie wirklich etwas geändert hat.
+# Produkte, die es im Katalog nicht mehr gibt, behalten ihre letzte Kopie.
+# Gibt weiter: Dictionary mit Anzahl geprüfter Produkte und aufgefrischter Likes.
+def refresh_like_snapshots(max_age=None, batch_size=None):
+    max_age = max_age if max_age is not None else app.config['LIKE_SNAPSHOT_MAX_AGE']
+    batch_size = batch_size or app.config['LIKE_SNAPSHOT_BATCH_SIZE']
+    now = datetime.now()
+    cutoff = datetime.fromtimestamp(now.timestamp() - max_age)
+    # Zwei Abfragen per UNION (ohne Kopie / Kopie zu alt), damit SQLite jeweils den Index auf 'snapshot_at' benutzt.
+    # Mit "IS NULL OR < cutoff" in einer Abfrage nimmt SQLite sonst den product_id-Index und geht alle Likes durch.
+    with_product = db.session.query(db_liked_product.product_id).filter(db_liked_product.product_id.isnot(None))
+    stale_ids = [product_id for (product_id,) in with_product.filter(db_liked_product.snapshot_at.is_(None))
+                 .union(with_product.filter(db_liked_product.snapshot_at < cutoff)).limit(batch_size)]
+    if not stale_ids:
+        return {"products": 0, "likes": 0}
+
+    catalog = get_catalog()
+    rows, missing = [], []
+    for product_id in stale_ids:
+        product = catalog.by_id.get(product_id)
+        if product is not None:
+            rows.append({"b_product_id": product_id, "b_now": now,
+                         **{f"b_{name}": value for name, value in like_snapshot(product).items() if name != "snapshot_at"}})
+        else:
+            missing.append({"b_product_id": product_id, "b_now": now})
+
+    table = db_liked_product.__table__
+    if missing:
+        # Nur den Zeitstempel setzen, damit diese Likes nicht bei jedem Durchlauf wieder ausgewählt werden.
+        db.session.execute(table.update().where(table.c.product_id == bindparam('b_product_id'))
+                           .values(snapshot_at=bindparam('b_now')), missing)
+    if not rows:
+        db.session.commit()
+        return {"products": len(stale_ids), "likes": 0}
+
+    changed = ((table.c.product.is_distinct_from(bindparam('b_product')))
+               | (table.c.thumbnail.is_distinct_from(bindparam('b_thumbnail')))
+               | (table.c.description.is_distinct_from(bindparam('b_description')))
+               | (table.c.price.is_distinct_from(bindparam('b_price'))))
+    # Zuerst 'likes_version' der User hochzählen, bei denen sich eine Kopie gleich wirklich ändert
+    # (gleiche Bedingung wie unten, deshalb vor dem UPDATE der Likes).
+    user_table = db_user.__table__
+    db.session.execute(
+        user_table.update()
+        .where(user_table.c.username.in_(
+            select(table.c.username).where(table.c.product_id == bindparam('b_product_id'), changed)))
+        .values(likes_version=user_table.c.likes_version + 1),
+        [{name: row[name] for name in ("b_product_id", "b_product", "b_thumbnail", "b_description", "b_price")}
+         for row in rows],
+    )
+    result = db.session.execute(
+        table.update()
+        .prefix_with("OR IGNORE") # Kollidiert ein neuer Titel mit einem anderen Like desselben Users: Zeile auslassen.
+        .where(table.c.product_id == bindparam('b_product_id'))
+        .values(product=bindparam('b_product'), thumbnail=bindparam('b_thumbnail'),
+                description=bindparam('b_description'), price=bindparam('b_price'),
+                snapshot_version=case((changed, table.c.snapshot_version + 1), else_=table.c.snapshot_version),
+                snapshot_at=bindparam('b_now')),
+        rows,
+    )
+    db.session.commit()
+    return {"products": len(stale_ids), "likes": result.rowcount}
+
+
+# Startet einen Hintergrund-Thread, der refresh_like_snapshots() alle 'interval' Sekunden ausführt.
+def start_snapshot_refresh(interval):
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                with app.app_context():
+                    result = refresh_like_snapshots()
+                logger.info("Produkt-Kopien in Likes aufgefrischt: %s", result)
+            except Exception:
+                logger.exception("Produkt-Kopien in Likes konnten nicht aufgefrischt werden")
+
+    threading.Thread(target=run, name="like-snapshot-refresh", daemon=True).start()
+
+
+# Kommandozeilen-Befehl: 'flask --app app refresh-snapshots' frischt die Produkt-Kopien in den Likes von Hand auf.
+@app.cli.command('refresh-snapshots')
+@click.option('--max-age', type=int, default=None, help='Kopien älter als so viele Sekunden auffrischen (0 = alle).')
+def refresh_snapshots_command(max_age):
+    result = refresh_like_snapshots(max_age=max_age)
+    click.echo(f"{result['likes']} Likes zu {result['products']} Produkten aufgefrischt.")
+
+
+# Startet einen Hintergrund-Thread, der sync_products() sofort und danach alle 'interval' Sekunden ausführt.
+def start_product_sync(interval):
+    def run():
+        while True:
+            try:
+                with app.app_context():
+                    result = sync_products()
+                logger.info("Produktkatalog synchronisiert: %s", result)
+            except Exception:
+                logger.exception("Produktkatalog konnte nicht synchronisiert werden")
+            time.sleep(interval)
+
+    threading.Thread(target=run, name="product-sync", daemon=True).start()
+
+
+# Kommandozeilen-Befehl: 'flask --app app sync-products' synchronisiert den Katalog einmal von Hand
+# und zeigt den Durchsatz an (gut zum Vergleichen verschiedener Seitengrößen/Parallelität).
+@app.cli.command('sync-products')
+@click.option('--page-size', type=int, default=None, help='Produkte pro API-Aufruf.')
+@click.option('--concurrency', type=int, default=None, help='Wie viele Seiten gleichzeitig geladen werden.')
+def sync_products_command(page_size, concurrency):
+    db.create_all()
+    result = sync_products(page_size=page_size, concurrency=concurrency)
+    click.echo(f"{result['products']} von {result['total']} Produkten synchronisiert "
+               f"in {result['seconds']} s ({result['per_second']} Produkte/s).")
+
+
+# Kommandozeilen-Befehl: 'flask --app app join-benchmark'
+# Vergleicht für einen künstlichen Katalog, wie lange das Zuordnen der gelikten Titel zu den Produkten dauert:
+# die alte Suche (jedes Produkt in der Liste der Likes suchen, O(Produkte x Likes)) gegen das Nachschlagen
+# in Catalog.by_title (ein Dictionary-Zugriff pro Like). Braucht keine Datenbank und keine externe API.
+@app.cli.command('join-benchmark')
+@click.option('--products', type=int, default=10000, help='Anzahl Produkte im Katalog.')
+@click.option('--likes', type=int, default=5000, help='Anzahl gelikter Titel.')
+@click.option('--repeat', type=int, default=3, help='Wie oft gemessen wird (der schnellste Lauf zählt).')
+def join_benchmark_command(products, likes, repeat):
+    catalog = Catalog([{"id": i, "title": f"Produkt {i}"} for i in range(1, products + 1)])
+    liked_titles = [f"Produkt {i}" for i in range(products, products - likes, -1)] # Gelikte Titel, wie aus der DB.
+
+    def scan():
+        return [product for product in catalog if product["title"] in liked_titles]
+
+    def lookup():
+        return [catalog.by_title[title] for title in dict.fromkeys(liked_titles) if title in catalog.by_title]
+
+    for name, join in (("Liste durchsuchen", scan), ("Catalog.by_title", lookup)):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            found = join()
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        click.echo(f"{name}: {len(found)} Treffer bei {products} Produkten x {likes} Likes in {best * 1000:.2f} ms")
+
+
+# Kommandozeilen-Befehl: 'flask --app app password-benchmark'
+# Misst, wie viele Passwörter pro Sekunde mit den eingestellten Parametern gehasht werden können (= Logins pro Sekunde).
+# Hilft beim Einstellen von PASSWORD_SCRYPT_N bzw. PASSWORD_PBKDF2_ITERATIONS.
+@app.cli.command('password-benchmark')
+@click.option('--count', type=int, default=20, help='Wie viele Hashes berechnet werden.')
+def password_benchmark_command(count):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=password_hasher.workers) as pool: # Den Pool voll auslasten.
+        list(pool.map(lambda i: password_hasher.hash(f"benchmark-{i}"), range(count)))
+    seconds = time.perf_counter() - start
+    per_second = count / seconds
+    cores = min(password_hasher.workers, os.cpu_count() or 1) # Mehr Kerne als Worker kann der Pool nicht nutzen.
+    click.echo(f"{count} Hashes ({password_hasher.algorithm}) in {seconds:.2f} s: {per_second:.1f} Logins/s "
+               f"mit {password_hasher.workers} Workern, {per_second / cores:.1f} Logins/s pro Kern.")
+
+
+# Lädt einen User aus der DB und gibt eine Kopie (CachedUser) zurück, oder None, wenn es ihn nicht gibt.
+def load_user_by_username(username):
+    row = db_user.query.filter_by(username=username).first()
+    return CachedUser.from_row(row) if row else None
+
+
+# Speichert für 'user' einen neuen Passwort-Hash mit den aktuellen Parametern.
+# Gibt weiter: den neu geladenen User (mit neuer Versionsnummer), oder den alten, wenn der Pool gerade voll ist.
+def rehash_password(user, password):
+    try:
+        password_hash = password_hasher.hash(password)
+    except PasswordHasherBusy:
+        return user # Nicht schlimm, dann beim nächsten Login.
+    row = db.session.get(db_user, user._id)
+    row.password = password_hash
+    db.session.commit() # Zählt 'version' hoch und entfernt den User aus dem Identity-Cache.
+    return identity_cache.get_by_username(user.username, load_user_by_username)
+
+
+# Kommandozeilen-Befehl: 'flask --app app identity-benchmark'
+# Misst eingeloggte Anfragen pro Sekunde auf '/profile' (Test-Client), einmal mit Identity-Cache und einmal ohne
+# (TTL 0 = jede Anfrage lädt den User aus der DB). Legt dafür einen Test-User an und löscht ihn danach wieder.
+@app.cli.command('identity-benchmark')
+@click.option('--requests', 'count', type=int, default=500, help='Anzahl Anfragen pro Messung.')
+def identity_benchmark_command(count):
+    db.create_all()
+    username, password = "__benchmark_identity", "benchmark"
+    db.session.add(db_user(username, password_hasher.hash(password), f"{username}@example.com", None))
+    db.session.commit()
+    client = app.test_client()
+    client.post('/login', data={'username': username, 'password': password})
+    client.get('/home') # Flash-Nachricht vom Login abholen.
+    ttl = identity_cache.ttl
+    try:
+        for label, cache_ttl in (("mit Identity-Cache", ttl), ("ohne Identity-Cache", 0)):
+            identity_cache.ttl = cache_ttl
+            identity_cache.clear()
+            start = time.perf_counter()
+            for _ in range(count):
+                client.get('/profile')
+            seconds = time.perf_counter() - start
+            click.echo(f"/profile {label}: {count} Anfragen in {seconds:.2f} s, {count / seconds:.0f} Anfragen/s")
+    finally:
+        identity_cache.ttl = ttl
+        client.get('/logout')
+        db_user.query.filter_by(username=username).delete()
+        db.session.commit()
+        identity_cache.invalidate(username=username)
+
+
+# Liefert den eingeloggten User - meistens aus dem Identity-Cache, ohne DB-Abfrage.
+# Die Versionsnummer in der Session sorgt dafür, dass nach einer Änderung neu geladen wird.
+# Gibt weiter: CachedUser oder None (nicht eingeloggt oder User existiert nicht mehr).
+def current_user():
+    username = session.get('user_data')
+    if not username:
+        return None
+    user = identity_cache.get_by_username(username, load_user_by_username, version=session.get('user_version'))
+    if user is not None and session.get('user_version') != user.version:
+        session['user_version'] = user.version # Neue Version merken, damit die nächsten Anfragen wieder aus dem Cache kommen.
+    return user
+
+
+# ETag für eine persönliche Seite ('profile' oder 'favorites') aus billigen Versionsnummern statt aus dem Inhalt:
+# 'version' (Profil) und - wenn die Seite Likes zeigt ('with_likes') - 'likes_version' des Users, aus EINER Abfrage
+# über den eindeutigen Index, dazu 'extra' (z.B. der Stand des Produktkatalogs) und der Name des CSS-Bundles
+# (ändert sich mit dem Layout).
+# Gibt weiter: den ETag, oder None, wenn die Seite nicht gecacht werden darf:
+# - es warten noch Flash-Nachrichten (die stehen nur im nächsten gerenderten HTML),
+# - der User hat noch Likes im Write-Behind-Puffer (noch nicht in 'likes_version' gezählt),
+# - der User existiert nicht (mehr).
+def user_page_etag(page, username, *extra, with_likes=True):
+    if not app.config['USER_PAGE_ETAGS'] or session.get('_flashes'):
+        return None
+    if with_likes and like_buffer is not None and like_buffer.has_pending(username):
+        return None
+    columns = (db_user.version, db_user.likes_version) if with_likes else (db_user.version,)
+    versions = db.session.query(*columns).filter_by(username=username).first()
+    if versions is None:
+        return None
+    key = "|".join(map(str, (page, username, *versions, *extra, assets.url_path('bundle.css'))))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+# Setzt die Cache-Header für eine persönliche Seite: schwacher ETag (das HTML wird evtl. noch komprimiert) und
+# 'private, no-cache' - nur der Browser selbst darf die Seite speichern und muss jedes Mal nachfragen.
+def user_page_cache_headers(response, etag):
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+    return response
+
+
+# Schickt der Browser den passenden ETag mit (If-None-Match), reicht "304 Not Modified" ohne Inhalt -
+# dann wird weder gerendert noch der Katalog gebraucht. Gibt weiter: die 304-Antwort oder None.
+def not_modified_response(etag):
+    if etag is None or not request.if_none_match.contains_weak(etag):
+        return None
+    return user_page_cache_headers(app.response_class(status=304), etag)
+
+
+# Stand des Produktkatalogs für den ETag der Favoriten-Seite (Likes ohne Produkt-Kopie kommen aus dem Katalog).
+# Nur der schon geladene Stand - hier wird nichts nachgeladen.
+def catalog_stamp():
+    catalog = catalog_cache.last_known(PRODUCTS_URL)
+    return catalog.loaded_at if catalog is not None else None
+
+
+# Neue Session-ID beim Login und Logout (gegen Session-Fixation), siehe ServerSideSession.regenerate().
+# Bei Cookie-Sessions ('cookie', 'compact') gibt es keine ID auf dem Server, dann passiert nichts.
+def regenerate_session():
+    regenerate = getattr(session, 'regenerate', None)
+    if regenerate is not None:
+        regenerate()
 
 
 # Startseite der Anwendung. Erreichbar unter '/'.
@@ -68,13 +941,20 @@ def register():
             flash("Email existiert schon!", "warning") # Nachricht an den User.
             return redirect(url_for('register')) # Zurück zum Registrierungsformular.
 
-        # Prüfen, ob Username schon vergeben ist.
-        if db_user.query.filter_by(username=user).first():
+        # Prüfen, ob Username schon vergeben ist (bekannte User kommen aus dem Identity-Cache).
+        if identity_cache.get_by_username(user, load_user_by_username):
             flash("Username existiert schon!", "warning") # Nachricht an den User.
             return redirect(url_for('register')) # Zurück zum Registrierungsformular.
 
+        # Passwort hashen (im Passwort-Pool).
+        try:
+            password_hash = password_hasher.hash(password)
+        except PasswordHasherBusy:
+            flash("Server ausgelastet, bitte gleich nochmal versuchen.", "warning")
+            return redirect(url_for('register'))
+
         # Neuen User in der Datenbank speichern.
-        new_user = db_user(user, password, email, country)
+        new_user = db_user(user, password_hash, email, country)
         db.session.add(new_user) # User zur Session hinzufügen.
         db.session.commit() # Änderungen in der DB speichern.
 
@@ -98,14 +978,26 @@ def login():
         user = request.form['username'] # Holt den Usernamen.
         password = request.form['password'] # Holt das Passwort.
 
-        user_data = db_user.query.filter_by(username=user).first() # User in DB suchen.
+        user_data = identity_cache.get_by_username(user, load_user_by_username) # User suchen (Cache oder DB).
+
+        # Passwort prüfen (im Passwort-Pool).
+        try:
+            password_ok = user_data is not None and password_hasher.verify(password, user_data.password)
+        except PasswordHasherBusy:
+            flash("Server ausgelastet, bitte gleich nochmal versuchen.", "warning")
+            return redirect(url_for('login'))
 
         # Wenn User gefunden und Passwort stimmt:
-        if user_data and user_data.password == password:
+        if password_ok:
+            # Hash mit alten Parametern (oder altes Klartext-Passwort)? Jetzt kennen wir das Passwort und können neu hashen.
+            if password_hasher.needs_rehash(user_data.password):
+                user_data = rehash_password(user_data, password)
+            regenerate_session() # Neue Session-ID für die eingeloggte Session.
             session['user_data'] = user_data.username # Usernamen in Session speichern.
+            session['user_version'] = user_data.version # Versionsnummer für den Identity-Cache.
             # Gelikte Produkte des Users aus DB holen und in Session speichern.
-            likes = db_liked_product.query.filter_by(username=user_data.username).all()
-            session['liked_products'] = [like.product for like in likes]
+            likes = load_likes(user_data.username)
+            session['liked_products'] = [like.product_id for like in likes if like.product_id is not None] # Nur die Produkt-IDs.
 
             flash("Login erfolgreich!", "success") # Erfolgsmeldung.
             return redirect(url_for('home')) # Weiter zur Home-Seite.
@@ -123,21 +1015,40 @@ def login():
     return render_template('login.html') # Login-Formular anzeigen.
 
 
+# Speichert die Likes aus der Session in der DB - mit möglichst wenig SQL-Anweisungen, egal wie viele Likes es sind:
+# 1. Eine Abfrage holt alle Produkt-IDs, die der User schon in der DB hat.
+# 2. Die Differenz (Session minus DB) wird in Python als Menge berechnet.
+# 3. Alle fehlenden Likes werden mit einem einzigen "INSERT ... ON CONFLICT DO NOTHING" (executemany) eingefügt.
+# Produkte, die im Katalog nicht bekannt sind, werden übersprungen (wir brauchen den Titel).
+def sync_session_likes(username, liked_product_ids):
+    if like_buffer is not None:
+        existing = {like.product_id for like in load_likes(username)} # Gepufferte Likes zählen als vorhanden.
+    else:
+        existing = {product_id for (product_id,) in
+                    db.session.query(db_liked_product.product_id).filter_by(username=username).all()}
+    rows = []
+    for product_id in set(liked_product_ids) - existing:
+        product = lookup_product(product_id=product_id)
+        if product:
+            rows.append({"username": username, "product_id": product_id, **like_snapshot(product)})
+    if rows:
+        db.session.execute(sqlite_insert(db_liked_product).on_conflict_do_nothing(), rows)
+        bump_likes_version([username])
+        db.session.commit() # Änderungen speichern.
+
+
 # Route für den Logout. Erreichbar unter '/logout'.
 @app.route('/logout')
 def logout():
     # Vor dem Logout: Aktuelle Likes aus der Session in die DB speichern, falls neue dazugekommen sind.
     if 'user_data' in session:
-        liked_products = session.get('liked_products', [])
-        for product in liked_products:
-            # Nur speichern, wenn noch nicht in DB.
-            if not db_liked_product.query.filter_by(username=session['user_data'], product=product).first():
-                db.session.add(db_liked_product(username=session['user_data'], product=product))
-        db.session.commit() # Änderungen speichern.
+        sync_session_likes(session['user_data'], session.get('liked_products', []))
     
     # Session leeren, um den User auszuloggen.
     session.pop('user_data', None) # das None sorgt dafür, dass kein Fehler kommt, wenn der Key nicht existiert.
     session.pop('liked_products', None)
+    session.pop('user_version', None)
+    regenerate_session() # Neue Session-ID, die alte wird gelöscht.
     flash("Ausgeloggt!", "success") # Erfolgsmeldung.
     return redirect(url_for('index')) # Zur Startseite umleiten.
 
@@ -160,21 +1071,58 @@ def home():
         return redirect(url_for('login')) # Zum Login umleiten.
 
 
+# Baut die Antwort für '/api/products' aus dem Katalog: nur die Felder, die eine Produktkarte braucht,
+# als fertiger JSON-Text plus ETag (Prüfsumme über den Inhalt). Wird pro Katalog-Stand nur einmal berechnet.
+def build_product_cards(catalog):
+    cards = [{field: product.get(field) for field in PRODUCT_CARD_FIELDS} for product in catalog.products]
+    body = json.dumps({"products": cards, "total": len(cards)}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+
+# API-Endpunkt für die Home-Seite: der Produktkatalog über unseren Server statt direkt von dummyjson.com.
+# - Kommt aus dem serverseitigen Katalog-Cache (bzw. der lokalen Kopie 'db_product'), nicht von der externen API.
+# - Nur id, title, description und thumbnail (kleinere Antwort).
+# - ETag und Last-Modified: Hat der Browser den Stand schon, antwortet der Server mit "304 Not Modified" ohne Inhalt.
+# - Cache-Control: Der Browser darf die Antwort PRODUCTS_API_MAX_AGE Sekunden ohne Nachfrage benutzen.
+@app.route('/api/products')
+def api_products():
+    try:
+        catalog = get_catalog()
+    except requests.exceptions.RequestException:
+        catalog = catalog_cache.last_known(PRODUCTS_URL) # API nicht erreichbar: letzten bekannten Stand ausliefern.
+        if catalog is None:
+            return jsonify(success=False, message="Produkte gerade nicht verfügbar"), 503
+
+    body, etag = catalog.derived("product_cards", build_product_cards)
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.last_modified = catalog.loaded_at
+    response.headers['Cache-Control'] = f"public, max-age={app.config['PRODUCTS_API_MAX_AGE']}"
+    return response.make_conditional(request) # Liefert 304, wenn If-None-Match / If-Modified-Since passen.
+
+
 # Profilseite des Users.
 # Erwartet: User muss eingeloggt sein (Session wird geprüft).
-# Gibt weiter: Rendert die 'profile.html' und übergibt die Userdaten sowie alle Produkte, die der User gelikt hat.
-# Zeigt dem User also sein Profil und seine Favoriten an.
+# Gibt weiter: Rendert die 'profile.html' mit den Userdaten (Name, E-Mail, Land, Registrierungsdatum).
+# Hat sich seit dem letzten Aufruf nichts geändert (gleicher ETag), kommt nur "304 Not Modified" zurück.
 @app.route('/profile')
 def profile():
     if 'user_data' not in session: # Prüfen, ob User eingeloggt ist.
         flash("Bitte einloggen!", "warning")
         return redirect(url_for('login')) # Wenn nicht, zum Login.
-    
-    user = db_user.query.filter_by(username=session['user_data']).first() # User-Daten aus DB holen.
-    # Alle gelikten Produkte des Users holen.
-    liked_products = [like.product for like in db_liked_product.query.filter_by(username=user.username).all()]
 
-    return render_template('profile.html', user=user, liked_products=liked_products) # Profilseite anzeigen.
+    etag = user_page_etag('profile', session['user_data'], with_likes=False) # Die Profilseite zeigt keine Likes.
+    not_modified = not_modified_response(etag)
+    if not_modified is not None:
+        return not_modified
+
+    user = current_user() # User-Daten holen (meistens aus dem Identity-Cache).
+    if user is None: # User gibt es nicht mehr -> ausloggen.
+        session.clear()
+        return redirect(url_for('login'))
+
+    response = app.make_response(render_template('profile.html', user=user)) # Profilseite anzeigen.
+    return user_page_cache_headers(response, etag)
 
 
 # Favoriten-Seite für eingeloggte User.
@@ -182,32 +1130,171 @@ def profile():
 # Gibt weiter: Holt alle Produkte, die der User gelikt hat, aus der Datenbank und vergleicht sie mit den Produkten aus der externen API.
 # Rendert dann die 'favorites.html' mit den detaillierten Produktinfos der Favoriten.
 # Wenn der User nicht eingeloggt ist, wird er zum Login umgeleitet.
+# Hat sich seit dem letzten Aufruf nichts geändert (gleicher ETag), kommt nur "304 Not Modified" zurück.
 @app.route('/favorites')
 def favorites():
     if 'user_data' not in session: # Prüfen, ob User eingeloggt ist.
         flash("Bitte einloggen!", "warning")
         return redirect(url_for('login')) # Wenn nicht, zum Login.
-    
-    user = db_user.query.filter_by(username=session['user_data']).first() # User-Daten holen.
-    # Nur die Namen der gelikten Produkte aus der Datenbank holen.
-    liked_db_products = [like.product for like in db_liked_product.query.filter_by(username=user.username).all()]
 
-    try:
-        # Produkte von externer API holen (hier DummyJSON, limitiert auf 20).
-        response = requests.get("https://dummyjson.com/products?limit=20")
-        response.raise_for_status() # Fehler werfen, wenn HTTP-Statuscode schlecht ist.
-        api_get_all_products = response.json().get("products", []) # JSON parsen und Produkte holen.
-    except requests.exceptions.RequestException as e:
-        flash(f"API-Fehler: {e}", "warning") # Fehler bei API-Zugriff.
-        return redirect(url_for('home')) # Zur Home-Seite umleiten.
-    
-    liked_products = [] # Liste für detaillierte gelikte Produkte.
-    # Nur die Produkte von der API filtern, die der User auch wirklich gelikt hat.
-    for product in api_get_all_products:
-        if product["title"] in liked_db_products:
-            liked_products.append(product) # Wenn gelikt, das ganze Produkt-Objekt hinzufügen.
+    etag = user_page_etag('favorites', session['user_data'], catalog_stamp())
+    not_modified = not_modified_response(etag)
+    if not_modified is not None:
+        return not_modified
+
+    user = current_user() # User-Daten holen (meistens aus dem Identity-Cache).
+    if user is None: # User gibt es nicht mehr -> ausloggen.
+        session.clear()
+        return redirect(url_for('login'))
+    # Die gelikten Produkte des Users aus der Datenbank holen - mit der gespeicherten Produkt-Kopie.
+    # Das ist eine Abfrage über den Index auf 'username', die externe API wird dafür nicht gebraucht.
+    liked_db_products = load_likes(user.username)
+
+    liked_products = {} # product_id -> Produkt, damit doppelte Likes nur einmal angezeigt werden.
+    without_snapshot = [] # Likes ohne Kopie (alte Einträge oder noch im Write-Behind-Puffer).
+    for like in liked_db_products:
+        if like.product_id is not None and getattr(like, 'snapshot_at', None) is not None:
+            liked_products[like.product_id] = {"id": like.product_id, "title": like.product, "thumbnail": like.thumbnail,
+                                               "description": like.description, "price": like.price}
+        else:
+            without_snapshot.append(like)
+
+    # Nur für Likes ohne Kopie wird der Produktkatalog gebraucht (lokale Kopie aus 'db_product' oder externe API,
+    # meistens aus dem Cache). Nachschlagen über die ID; alte Einträge ohne ID (noch nicht migriert) über den Titel.
+    if without_snapshot:
+        try:
+            catalog = get_catalog()
+        except requests.exceptions.RequestException:
+            # API kaputt oder abgeschaltet (Circuit Breaker): Wenn wir noch einen alten Stand haben, den benutzen.
+            catalog = catalog_cache.last_known(PRODUCTS_URL)
+            flash("Einige Produktdaten sind gerade nicht verfügbar (API nicht erreichbar).", "warning")
+            etag = None # Unvollständige Seite nicht cachen.
+        for like in without_snapshot if catalog is not None else []:
+            if like.product_id is not None:
+                product = catalog.by_id.get(like.product_id)
+            else:
+                product = catalog.by_title.get(like.product)
+            if product:
+                liked_products[product["id"]] = product
+    # Die Karten kommen fertig gerendert aus dem Fragment-Cache, das Template setzt sie nur noch zusammen.
+    product_cards = [render_product_card(product) for product in liked_products.values()]
+
+    response = app.make_response(render_template('favorites.html', user=user, product_cards=product_cards)) # Favoriten-Seite anzeigen.
+    return user_page_cache_headers(response, etag)
+
+
+# Gerenderte Produktkarte (templates/product_card.html) für ein Produkt-Dictionary - aus dem Fragment-Cache.
+# Der Schlüssel enthält die angezeigten Daten: Ändert sich ein Produkt, wird nur seine Karte neu gerendert.
+def render_product_card(product):
+    key = (product["id"], product.get("title"), product.get("thumbnail"), product.get("description"))
+    return fragment_cache.get(key, lambda: Markup(app.jinja_env.get_template('product_card.html').render(product=product)))
+
 
-    return render_template('favorites.html', user=user, liked_products=liked_products) # Favoriten-Seite anzeigen.
+# Für die Templates: URL eines Bundles mit Prüfsumme im Namen, z.B. asset_url('bundle.css').
+# Funktioniert wie url_for('static', filename=...), nur mit dem gebauten Dateinamen.
+@app.template_global()
+def asset_url(name, **values):
+    return url_for('static', filename=assets.url_path(name), **values)
+
+
+# Nach jeder Anfrage: Bundles (Dateien mit Prüfsumme im Namen) dürfen vom Browser "für immer" gecacht werden,
+# ohne nachzufragen. Ändert sich der Inhalt, ändert sich auch der Name und damit die URL.
+@app.after_request
+def cache_asset_bundles(response):
+    if request.endpoint == 'static' and assets.is_bundle((request.view_args or {}).get('filename')):
+        response.headers['Cache-Control'] = f"public, max-age={app.config['ASSET_BUNDLE_MAX_AGE']}, immutable"
+    return response
+
+
+# Statische Dateien ausliefern (ersetzt Flasks eigene 'static'-Route): Gibt es eine vorkomprimierte Kopie
+# (z.B. 'bundle.css.gz'), die der Browser versteht, wird diese geschickt - ohne bei jeder Anfrage neu zu komprimieren.
+def send_static_precompressed(filename):
+    encoding = choose_encoding(request.accept_encodings) if app.config['COMPRESS_ENABLED'] else None
+    if encoding is not None:
+        compressed_name = filename + dict(ENCODINGS)[encoding]
+        compressed_path = safe_join(app.static_folder, compressed_name)
+        if compressed_path is not None and os.path.isfile(compressed_path):
+            response = send_from_directory(app.static_folder, compressed_name,
+                                           mimetype=mimetypes.guess_type(filename)[0],
+                                           max_age=app.get_send_file_max_age(filename))
+            response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+            compression_stats.record_static()
+            return response
+    response = app.send_static_file(filename)
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+app.view_functions['static'] = send_static_precompressed
+
+
+# Nach jeder Anfrage: dynamische Antworten (HTML, JSON) komprimieren, wenn der Browser es versteht
+# und die Antwort groß genug ist. Statische Dateien (direct_passthrough) sind schon oben erledigt.
+# Ein vorhandener ETag wird "schwach" (W/"..."), weil die komprimierten Bytes anders sind - der Vergleich
+# bei If-None-Match (304) funktioniert damit weiterhin.
+@app.after_request
+def compress_response(response):
+    if (not app.config['COMPRESS_ENABLED'] or response.status_code != 200 or response.direct_passthrough
+            or response.is_streamed or 'Content-Encoding' in response.headers
+            or response.mimetype not in app.config['COMPRESS_MIMETYPES']):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    data = response.get_data()
+    if encoding is None or len(data) < app.config['COMPRESS_MIN_SIZE']:
+        return response
+    response.set_data(compression_stats.compress(data, encoding, app.config['COMPRESS_LEVEL'])) # Setzt auch Content-Length.
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+# Kommandozeilen-Befehl: 'flask --app app build-assets' baut die CSS-Bundles von Hand und zeigt die Größen an.
+# Legt außerdem die komprimierten Kopien (.gz/.br) der statischen Dateien an.
+@app.cli.command('build-assets')
+def build_assets_command():
+    for name, path in assets.build().items():
+        before, after = assets.sizes[name]
+        click.echo(f"{name} -> static/{path} ({before} -> {after} Bytes, {len(app.config['ASSET_BUNDLES'][name])} Dateien)")
+    for path, size, sizes in precompress_folder(app.static_folder):
+        compressed = ", ".join(f"{encoding}: {value}" for encoding, value in sizes.items())
+        click.echo(f"{os.path.relpath(path, app.static_folder)}: {size} Bytes -> {compressed}")
+
+
+# Kommandozeilen-Befehl: 'flask --app app compression-benchmark'
+# Ruft einige Seiten ohne und mit Komprimierung auf und zeigt die Bytes auf der Leitung und die CPU-Zeit pro Antwort.
+# Vorkomprimierte statische Dateien kosten beim Ausliefern keine CPU für die Komprimierung.
+@app.cli.command('compression-benchmark')
+@click.option('--repeat', type=int, default=50, help='Wie oft pro Seite komprimiert wird (für die CPU-Messung).')
+def compression_benchmark_command(repeat):
+    db.create_all()
+    with app.test_request_context():
+        paths = ['/', '/login', '/register', '/api/products', asset_url('bundle.css')]
+    client = app.test_client()
+    for path in paths:
+        plain = client.get(path, headers={'Accept-Encoding': 'identity'})
+        if plain.status_code != 200:
+            click.echo(f"{path}: übersprungen (Status {plain.status_code})")
+            continue
+        line = f"{path}: {len(plain.data)} Bytes"
+        for encoding, suffix in ENCODINGS:
+            static_hits = compression_stats.static_hits
+            response = client.get(path, headers={'Accept-Encoding': encoding})
+            if response.headers.get('Content-Encoding') != encoding:
+                line += f", {encoding}: nicht komprimiert (zu klein)"
+                continue
+            if compression_stats.static_hits > static_hits:
+                line += f", {encoding}: {len(response.data)} Bytes (vorkomprimiert, 0 ms CPU)"
+                continue
+            start = time.process_time()
+            for _ in range(repeat):
+                compression_stats.compress(plain.data, encoding, app.config['COMPRESS_LEVEL'])
+            cpu_ms = (time.process_time() - start) / repeat * 1000
+            line += f", {encoding}: {len(response.data)} Bytes ({cpu_ms:.3f} ms CPU)"
+        click.echo(line)
 
 
 # Debug-Route: Zeigt Session-Daten als JSON. Nur für Entwicklung!
@@ -216,76 +1303,269 @@ def debug_session_view():
     return jsonify(dict(session)) # Session in ein Dictionary umwandeln und als JSON ausgeben.
 
 
+# Nach jeder Anfrage: Größe der gesetzten Cookies messen (Warnung im Log, wenn über dem Budget).
+# Über das Signal 'request_finished', weil das Session-Cookie erst nach allen after_request-Funktionen gesetzt wird.
+@request_finished.connect_via(app)
+def record_cookie_size(sender, response, **extra):
+    cookie_sizes.record(response, request.path)
+
+
+# Debug-Route: Zeigt die Größe der zuletzt gesetzten Session-Cookies. Nur für Entwicklung!
+@app.route('/debug-session-size')
+def debug_session_size_view():
+    return jsonify(backend=app.config['SESSION_BACKEND'], cookies=cookie_sizes.stats())
+
+
+# Debug-Route: Zeigt die Kennzahlen des Katalog-Caches (Hits, Misses, Einträge). Nur für Entwicklung!
+@app.route('/debug-cache')
+def debug_cache_view():
+    return jsonify(catalog=catalog_cache.stats(), upstream=upstream.stats(), identity=identity_cache.stats(),
+                   passwords=password_hasher.stats(), like_buffer=like_buffer.stats() if like_buffer else None,
+                   compression=compression_stats.stats(), fragments=fragment_cache.stats())
+
+
+# Debug-Route: Leert den Katalog-Cache (und die gerenderten Produktkarten), damit beim nächsten Aufruf neu geladen wird.
+@app.route('/debug-cache/invalidate', methods=['POST'])
+def debug_cache_invalidate():
+    catalog_cache.invalidate()
+    fragment_cache.clear()
+    return jsonify(success=True, catalog=catalog_cache.stats())
+
+
+
+
+# Möchte der Aufrufer JSON zurück (AJAX mit fetch) statt einer Weiterleitung mit Flash-Nachricht?
+def wants_json():
+    return request.is_json or request.accept_mimetypes.best == 'application/json'
+
+
+# Antwort für AJAX-Aufrufer: der neue Like-Zustand des Produkts. Damit kann die Seite die eine Produktkarte
+# direkt aktualisieren, statt komplett neu zu laden. 'changed' sagt, ob sich wirklich etwas geändert hat.
+def like_state_response(product_id, title, liked, changed, message):
+    return jsonify(success=True, id=product_id, title=title, liked=liked, changed=changed,
+                   liked_count=len(session.get('liked_products', [])), message=message), 200
 
 
 # Route für die Like-Funktion. Wird per AJAX aufgerufen. Ajax ist eine Technik, um im Hintergrund Daten zu senden und zu empfangen, ohne die Seite neu zu laden.
+# Gibt weiter: den neuen Zustand als JSON (siehe like_state_response()), ohne Flash-Nachricht.
 @app.route('/like', methods=['POST'])
 def like():
-    data = request.get_json()
-    if not data:
+    if 'user_data' not in session:
+        return jsonify(success=False, message="Nicht eingeloggt"), 401
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data: # z.B. ein JSON-Array statt eines Objekts.
         return jsonify(success=False, message="Keine Daten"), 400
     product_title = data.get('title')
 
-    if not product_title:
-        return jsonify(success=False, message="Fehlender Titel"), 400
+    # Das Produkt wird über seine ID gelikt. Ältere Aufrufe, die nur den Titel schicken, gehen auch noch.
+    try:
+        product_id = int(data['id']) if data.get('id') is not None else None
+    except (TypeError, ValueError):
+        return jsonify(success=False, message="Ungültige Produkt-ID"), 400
+    if product_id is None and not product_title:
+        return jsonify(success=False, message="Fehlende Produkt-ID"), 400
+
+    # ID und Titel aus dem Katalog holen (der Titel wird zur Anzeige mitgespeichert).
+    product = lookup_product(product_id=product_id, title=product_title)
+    if product:
+        product_id, product_title = product["id"], product["title"]
+    elif product_id is None or not product_title:
+        return jsonify(success=False, message="Unbekanntes Produkt"), 404
 
     current_username = session['user_data']
     liked_in_session = session.get('liked_products', [])
 
-    existing_db_like = db_liked_product.query.filter_by(username=current_username, product=product_title).first()
-    if existing_db_like:
-        flash(f'"{product_title}" ist schon in Favoriten.', 'warning')
-        if product_title not in liked_in_session:
-            liked_in_session.append(product_title)
-            session['liked_products'] = liked_in_session
-            session.modified = True
+    if like_buffer is not None:
+        # Write-Behind: nur in den Puffer legen, geschrieben wird gesammelt im Hintergrund.
+        already_liked = like_buffer.pending_state(current_username, product_id)
+        if already_liked is None:
+            already_liked = db.session.query(db_liked_product._id).filter_by(
+                username=current_username, product_id=product_id).first() is not None
+        like_buffer.add(current_username, product_id, product_title, True)
+        added = not already_liked
     else:
-        new_db_like = db_liked_product(username=current_username, product=product_title)
-        db.session.add(new_db_like)    # Eintrag wird hier hinzugefügt!
+        # Upsert: Einfach einfügen - gibt es das Like schon, greift der eindeutige Index und SQLite ignoriert die Zeile
+        # ("INSERT ... ON CONFLICT DO NOTHING"). Das spart die vorherige Abfrage, ob es schon existiert.
+        # Dabei wird gleich die Produkt-Kopie mitgespeichert (für die Favoriten-Seite).
+        result = db.session.execute(
+            sqlite_insert(db_liked_product)
+            .values(username=current_username, product_id=product_id, **like_snapshot(product, product_title))
+            .on_conflict_do_nothing()
+        )
+        added = result.rowcount > 0
+        if added:
+            bump_likes_version([current_username])
         db.session.commit()
-        if product_title not in liked_in_session:
-            liked_in_session.append(product_title)
-            session['liked_products'] = liked_in_session
-            session.modified = True
-        flash(f'"{product_title}" zu Favoriten hinzugefügt!', 'success')
+    if product_id not in liked_in_session:
+        liked_in_session.append(product_id)
+        session['liked_products'] = liked_in_session
+        session.modified = True
+
+    if added:
+        message = f'"{product_title}" zu Favoriten hinzugefügt!'
+    else:
+        message = f'"{product_title}" ist schon in Favoriten.'
+    return like_state_response(product_id, product_title, True, added, message)
+
 
-    return jsonify(success=True, message=f"Like für {product_title} aktualisiert."), 200
 # Route für die Unlike-Funktion. Wird per POST-Anfrage aufgerufen.
+# - Per AJAX (JSON-Body oder 'Accept: application/json'): Antwort ist der neue Zustand als JSON, keine Flash-Nachricht.
+# - Als normales Formular (Favoriten-Seite): Flash-Nachricht und Weiterleitung wie bisher.
 @app.route('/unlike', methods=['POST'])
 def unlike():
+    as_json = wants_json()
     current_username = session.get('user_data') # Aktuellen Usernamen holen.
     if not current_username:
+        if as_json:
+            return jsonify(success=False, message="Nicht eingeloggt"), 401
         flash("Nicht eingeloggt!", "danger")
         return redirect(url_for('login')) # Wenn nicht eingeloggt, zum Login.
 
-    product_to_unlike = request.form.get('title') # Produkttitel aus Formular holen.
-    liked = session.get('liked_products', []) # Gelikte Produkte aus Session holen.
+    data = (request.get_json(silent=True) or {}) if request.is_json else request.form # JSON-Body oder Formular.
+    if not isinstance(data, dict): # z.B. ein JSON-Array -> wie "kein Produkt angegeben".
+        data = {}
+    try:
+        product_id = int(data['id']) if data.get('id') not in (None, '') else None # Produkt-ID holen.
+    except (TypeError, ValueError):
+        product_id = None
+    product_to_unlike = data.get('title') # Produkttitel (für die Meldung / ältere Formulare).
+    liked = session.get('liked_products', []) # Gelikte Produkte (IDs) aus Session holen.
 
-    if not product_to_unlike:
+    if product_id is None and not product_to_unlike:
+        if as_json:
+            return jsonify(success=False, message="Fehlende Produkt-ID"), 400
         flash("Kein Produkt angegeben", "warning")
         return redirect(url_for('favorites')) # Wenn kein Produkt, zurück zu Favoriten.
-    
-    # Produkt aus DB löschen.
-    db_product_entry = db_liked_product.query.filter_by(username=current_username, product=product_to_unlike).first() #first() gibt das erste gefundene Ergebnis zurück oder None, wenn nichts gefunden wurde.
-    #wenn das Produkt in der DB existiert, löschen.
+
+    # Like-Eintrag suchen - über die ID, bei älteren Formularen über den Titel.
+    if like_buffer is not None:
+        # Mit Write-Behind zählen auch noch nicht geschriebene Likes.
+        db_product_entry = next((like for like in load_likes(current_username)
+                                 if (like.product_id == product_id if product_id is not None
+                                     else like.product == product_to_unlike)), None)
+    elif product_id is not None:
+        db_product_entry = db_liked_product.query.filter_by(username=current_username, product_id=product_id).first() #first() gibt das erste gefundene Ergebnis zurück oder None, wenn nichts gefunden wurde.
+    else:
+        db_product_entry = db_liked_product.query.filter_by(username=current_username, product=product_to_unlike).first()
+    #wenn das Produkt existiert, löschen.
     if db_product_entry:
-        db.session.delete(db_product_entry)
-        db.session.commit()
-        flash(f'"{product_to_unlike}" nicht mehr favorisiert.', 'success') # Erfolgsmeldung.
+        product_id, product_to_unlike = db_product_entry.product_id, db_product_entry.product
+        if like_buffer is not None and product_id is not None:
+            like_buffer.add(current_username, product_id, product_to_unlike, False) # Wird gesammelt gelöscht.
+        else:
+            db.session.delete(db_product_entry)
+            bump_likes_version([current_username])
+            db.session.commit()
+        message, category = f'"{product_to_unlike}" nicht mehr favorisiert.', 'success' # Erfolgsmeldung.
 
         # Auch aus Session entfernen.
-        if product_to_unlike in liked:
-            liked.remove(product_to_unlike)
+        if product_id in liked:
+            liked.remove(product_id)
             session['liked_products'] = liked
             session.modified = True # Wichtig: Session als geändert markieren! Dmait Flask weiß, dass sie gespeichert werden muss.
     else:
-        flash(f'"{product_to_unlike}" nicht in Favoriten.', 'warning') # Warnung, wenn nicht gefunden.
+        message, category = f'"{product_to_unlike or product_id}" nicht in Favoriten.', 'warning' # Warnung, wenn nicht gefunden.
 
+    if as_json:
+        return like_state_response(product_id, product_to_unlike, False, category == 'success', message)
+    flash(message, category)
     return redirect(url_for('favorites')) # Zurück zu Favoriten.
 
 
+# Prüft eine Operation aus '/api/likes/batch' und schlägt das Produkt im Katalog nach.
+# Gibt weiter: (op, product_id, title, error) - error ist None, wenn alles passt.
+def parse_like_operation(operation):
+    if not isinstance(operation, dict):
+        return None, None, None, "Ungültige Operation"
+    op, product_id = operation.get('op'), operation.get('id')
+    if op not in ('add', 'remove'):
+        return op, product_id, None, "Unbekannte Operation (erlaubt: add, remove)"
+    try:
+        product_id = int(product_id)
+    except (TypeError, ValueError):
+        return op, product_id, None, "Ungültige Produkt-ID"
+    product = lookup_product(product_id=product_id)
+    if product is None and op == 'add':
+        return op, product_id, None, "Unbekanntes Produkt" # Entfernen geht auch ohne Katalog-Eintrag.
+    return op, product_id, product["title"] if product else None, None
+
+
+# API-Endpunkt für Mehrfachauswahl: viele Likes/Unlikes mit EINEM Aufruf statt einem POST pro Produkt.
+# Erwartet (JSON): {"operations": [{"op": "add", "id": 3}, {"op": "remove", "id": 7}, ...]}
+# - Der aktuelle Zustand wird mit einer Abfrage geholt, die Operationen werden der Reihe nach im Speicher angewendet.
+# - Geschrieben wird nur der Unterschied zwischen Anfangs- und Endzustand, in EINER Transaktion
+#   (bzw. über den Write-Behind-Puffer), und die Session wird einmal aktualisiert.
+# Gibt weiter: ein Ergebnis pro Operation ({id, op, liked, changed} oder {id, op, error}) und die neue Anzahl Likes.
+@app.route('/api/likes/batch', methods=['POST'])
+def like_batch():
+    if 'user_data' not in session:
+        return jsonify(success=False, message="Nicht eingeloggt"), 401
+    data = request.get_json(silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return jsonify(success=False, message="Keine Operationen"), 400
+    if len(operations) > app.config['LIKE_BATCH_MAX_OPERATIONS']:
+        return jsonify(success=False,
+                       message=f"Höchstens {app.config['LIKE_BATCH_MAX_OPERATIONS']} Operationen pro Aufruf"), 413
+
+    current_username = session['user_data']
+    parsed = [parse_like_operation(operation) for operation in operations]
+    ids = {product_id for op, product_id, title, error in parsed if error is None}
+
+    # Aktueller Zustand: welche dieser Produkte hat der User schon gelikt? (eine Abfrage)
+    if like_buffer is not None:
+        initially_liked = {like.product_id for like in load_likes(current_username)} & ids
+    else:
+        initially_liked = {product_id for (product_id,) in db.session.query(db_liked_product.product_id).filter(
+            db_liked_product.username == current_username, db_liked_product.product_id.in_(ids))}
+
+    liked_now = set(initially_liked)
+    titles = {}
+    results = []
+    for op, product_id, title, error in parsed:
+        if error is not None:
+            results.append({"id": product_id, "op": op, "error": error})
+            continue
+        liked = op == 'add'
+        results.append({"id": product_id, "op": op, "liked": liked, "changed": (product_id in liked_now) != liked})
+        if liked:
+            liked_now.add(product_id)
+        else:
+            liked_now.discard(product_id)
+        titles[product_id] = title or titles.get(product_id)
+
+    added, removed = liked_now - initially_liked, initially_liked - liked_now
+    events = [(current_username, product_id, titles[product_id], True) for product_id in sorted(added)]
+    events += [(current_username, product_id, titles[product_id], False) for product_id in sorted(removed)]
+    if events:
+        if like_buffer is not None:
+            for event_args in events:
+                like_buffer.add(*event_args)
+        else:
+            write_like_batch(events) # Ein INSERT und ein DELETE (executemany), ein Commit.
+
+    # Session einmal aktualisieren.
+    liked_in_session = [product_id for product_id in session.get('liked_products', []) if product_id not in removed]
+    liked_in_session += [product_id for product_id in sorted(liked_now) if product_id not in liked_in_session]
+    session['liked_products'] = liked_in_session
+
+    return jsonify(success=True, results=results, added=len(added), removed=len(removed),
+                   liked_count=len(liked_in_session)), 200
+
+
 # Startet die Flask-App.
 if __name__ == '__main__':
     with app.app_context(): # Erstellt einen App-Kontext, wichtig für DB-Operationen beim Start.
         db.create_all() # Erstellt alle DB-Tabellen, falls sie noch nicht existieren.
-    app.run(debug=True) # Startet den Server im Debug-Modus (Fehleranzeige, Auto-Reload). Im echten Betrieb auf False setzen!
+        migrate_database() # Fehlende Spalten in bestehenden Tabellen ergänzen (z.B. product_id).
+    debug = True # Debug-Modus (Fehleranzeige, Auto-Reload). Im echten Betrieb auf False setzen!
+    # Mit Auto-Reload läuft diese Datei zweimal: im Überwachungs-Prozess und im Prozess, der die Anfragen beantwortet
+    # (dort setzt Werkzeug WERKZEUG_RUN_MAIN). Die Hintergrund-Threads nur dort starten, sonst laufen sie doppelt.
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        if app.config['PRODUCT_SYNC_INTERVAL']:
+            start_product_sync(app.config['PRODUCT_SYNC_INTERVAL']) # Lokalen Produktkatalog regelmäßig mit der API abgleichen.
+        if app.config['LIKE_SNAPSHOT_REFRESH_INTERVAL']:
+            start_snapshot_refresh(app.config['LIKE_SNAPSHOT_REFRESH_INTERVAL']) # Produkt-Kopien in den Likes aktuell halten.
+        if app.config['CATALOG_REFRESH_INTERVAL']:
+            catalog_cache.start_scheduler(app.config['CATALOG_REFRESH_INTERVAL']) # Katalog im Hintergrund aktuell halten.
+    app.run(debug=debug) # Startet den Server.
@@ -0,0 +1,79 @@
+# Asset-Pipeline für die Stylesheets.
+# base.html hat bisher acht einzelne CSS-Dateien eingebunden - das sind acht Anfragen (bzw. Nachfragen beim Browser-Cache)
+# pro Seitenaufruf. Stattdessen werden die Dateien beim Start (oder per 'flask build-assets') zu EINER Datei
+# zusammengefügt, verkleinert (Kommentare und unnötige Leerzeichen raus) und unter einem Namen mit Prüfsumme
+# gespeichert, z.B. 'static/dist/bundle.3f9a1c2b7d4e.css'.
+# Weil sich der Name bei jeder Änderung am Inhalt ändert, darf der Browser die Datei "für immer" cachen
+# (Cache-Control: immutable) - eine neue Version hat automatisch eine neue URL.
+
+import hashlib                       # Prüfsumme für den Dateinamen.
+import json                          # Für die Manifest-Datei (welcher Name gehört zu welchem Bundle).
+import os                            # Dateien und Ordner.
+import re                            # Für das Verkleinern (Minify) von CSS.
+
+BUNDLE_DIR = "dist" # Unterordner von 'static', in dem die Bundles landen.
+
+
+# Verkleinert CSS: entfernt Kommentare und überflüssige Leerzeichen.
+# Absichtlich einfach gehalten (keine Umbenennung o.ä.), das reicht für unsere handgeschriebenen Dateien.
+def minify_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)   # Kommentare
+    css = re.sub(r"\s+", " ", css)                    # Zeilenumbrüche und mehrere Leerzeichen -> ein Leerzeichen
+    css = re.sub(r"\s*([{};:,>])\s*", r"\1", css)     # Leerzeichen um { } ; : , > herum
+    css = css.replace(";}", "}")                      # Letztes Semikolon in einem Block ist unnötig
+    return css.strip()
+
+
+# Baut die Bundles und merkt sich, welcher Dateiname (mit Prüfsumme) zu welchem Bundle gehört.
+# Erwartet: static_folder (Pfad zum 'static'-Ordner) und bundles (Dictionary Bundle-Name -> Liste von CSS-Dateien).
+# Gibt weiter: url_path(name) liefert den Pfad relativ zu 'static', z.B. 'dist/bundle.3f9a1c2b7d4e.css'.
+class AssetBundler:
+    def __init__(self, static_folder, bundles):
+        self.static_folder = static_folder
+        self.bundles = bundles
+        self.manifest = {} # Bundle-Name -> Pfad relativ zu 'static'
+        self.sizes = {}    # Bundle-Name -> (Bytes vorher, Bytes nachher), für die Ausgabe im CLI-Befehl
+
+    # Baut alle Bundles. Existiert eine Datei mit derselben Prüfsumme schon, wird sie nicht neu geschrieben.
+    # Alte Versionen desselben Bundles werden gelöscht. Gibt das Manifest zurück.
+    def build(self):
+        output_dir = os.path.join(self.static_folder, BUNDLE_DIR)
+        os.makedirs(output_dir, exist_ok=True)
+        for name, files in self.bundles.items():
+            sources = []
+            for filename in files:
+                with open(os.path.join(self.static_folder, filename), encoding="utf-8") as f:
+                    sources.append(f.read())
+            original = "\n".join(sources)
+            content = minify_css(original).encode("utf-8")
+            digest = hashlib.sha256(content).hexdigest()[:12]
+            stem, extension = os.path.splitext(name)
+            hashed_name = f"{stem}.{digest}{extension}"
+            path = os.path.join(output_dir, hashed_name)
+            if not os.path.exists(path):
+                with open(path, "wb") as f:
+                    f.write(content)
+            self._remove_old_versions(output_dir, stem, extension, keep=hashed_name)
+            self.manifest[name] = f"{BUNDLE_DIR}/{hashed_name}"
+            self.sizes[name] = (len(original.encode("utf-8")), len(content))
+        with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        return self.manifest
+
+    # Löscht ältere Bundles mit demselben Namen, aber anderer Prüfsumme (z.B. 'bundle.<alt>.css').
+    def _remove_old_versions(self, output_dir, stem, extension, keep):
+        pattern = re.compile(rf"^{re.escape(stem)}\.[0-9a-f]{{12}}{re.escape(extension)}$")
+        for filename in os.listdir(output_dir):
+            if filename != keep and pattern.match(filename):
+                os.remove(os.path.join(output_dir, filename))
+
+    # Pfad (relativ zu 'static') für ein Bundle. Wurde noch nicht gebaut, wird zuerst gebaut.
+    def url_path(self, name):
+        if name not in self.manifest:
+            self.build()
+        return self.manifest[name]
+
+    # Gehört dieser Pfad (relativ zu 'static') zu einem gebauten Bundle (Name mit Prüfsumme)? Dann darf er
+    # "für immer" gecacht werden. Andere Dateien in 'dist' (z.B. manifest.json) ändern sich ohne neuen Namen.
+    def is_bundle(self, filename):
+        return filename is not None and filename in self.manifest.values()
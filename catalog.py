@@ -0,0 +1,239 @@
+# Zwischenspeicher (Cache) für den Produktkatalog von dummyjson.com.
+# Statt bei jedem Aufruf von '/favorites' die externe API zu fragen, merken wir uns die Antwort
+# für eine bestimmte Zeit (TTL = "time to live") im Arbeitsspeicher des Prozesses.
+# Wiederholte Seitenaufrufe werden dann direkt aus dem Speicher bedient.
+#
+# "Stale-while-revalidate": Ist ein Eintrag abgelaufen, aber noch nicht zu alt (max_stale), bekommt der User
+# sofort die alte Version und ein Hintergrund-Thread lädt die neue. So wartet nach dem ersten Laden
+# keine Anfrage mehr auf die externe API. Erst wenn ein Eintrag älter als max_stale ist, wird blockierend geladen.
+
+import logging                       # Für Log-Meldungen, wenn das Nachladen im Hintergrund fehlschlägt.
+import threading                     # Für das Lock und die Hintergrund-Threads.
+import time                          # Für Zeitstempel (wann wurde ein Eintrag geladen?).
+from collections import OrderedDict  # Merkt sich die Reihenfolge -> damit können wir den ältesten Eintrag rauswerfen (LRU).
+
+logger = logging.getLogger(__name__)
+
+
+# Der geladene Produktkatalog mit Nachschlage-Tabellen (Dictionaries) nach ID und Titel.
+# Die Tabellen werden einmal pro geladenem Katalog gebaut und liegen mit im Cache. Damit kostet
+# "Gibt es ein Produkt mit diesem Titel?" nur einen Dictionary-Zugriff statt eine Suche durch die ganze Liste.
+class Catalog:
+    def __init__(self, products):
+        self.products = products                                     # Alle Produkte (Liste von Dictionaries, wie von der API).
+        self.by_id = {product["id"]: product for product in products}       # ID -> Produkt
+        self.by_title = {product["title"]: product for product in products} # Titel -> Produkt
+        self.loaded_at = time.time()                                 # Wann dieser Stand geladen wurde (Unix-Zeit).
+        self._derived = {}                                           # Aus dem Katalog berechnete Werte (siehe derived()).
+
+    # Liefert einen aus dem Katalog berechneten Wert (z.B. eine fertige JSON-Antwort). 'build(catalog)' wird nur
+    # beim ersten Aufruf pro Katalog-Stand ausgeführt, danach kommt der Wert aus dem Speicher.
+    def derived(self, key, build):
+        if key not in self._derived:
+            self._derived[key] = build(self)
+        return self._derived[key]
+
+    def __len__(self):
+        return len(self.products)
+
+    def __iter__(self):
+        return iter(self.products)
+
+
+# "Single-Flight": Wenn mehrere Anfragen gleichzeitig denselben Key laden wollen (z.B. wenn der Cache noch leer ist),
+# macht nur die erste den echten API-Aufruf. Alle anderen warten auf dieses Ergebnis und bekommen es mit.
+# So gibt es keine "Herde" von gleichzeitigen Anfragen an dummyjson.com.
+class SingleFlight:
+    def __init__(self):
+        self.calls = 0      # Zähler: wie viele echte Aufrufe von fn() es gab.
+        self.coalesced = 0  # Zähler: wie viele Aufrufer sich an einen laufenden Aufruf angehängt haben.
+        self._inflight = {} # key -> _Call, der gerade läuft.
+        self._lock = threading.Lock()
+
+    # Führt fn() für 'key' aus - oder wartet auf einen bereits laufenden Aufruf mit demselben Key.
+    # Wirft fn() eine Exception, bekommen alle wartenden Aufrufer dieselbe Exception.
+    def do(self, key, fn):
+        with self._lock:
+            call = self._inflight.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._inflight[key] = call
+                self.calls += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set() # Alle Wartenden aufwecken.
+        return call.value
+
+    # Kennzahlen als Dictionary.
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced, "inflight": len(self._inflight)}
+
+
+# Ein laufender Aufruf innerhalb von SingleFlight: Ergebnis oder Fehler, und ein Event zum Warten.
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+# Ein einzelner Cache-Eintrag: der gespeicherte Wert, wann er geladen wurde und mit welcher Funktion er neu geladen wird.
+class CacheEntry:
+    def __init__(self, value, fetched_at, loader=None):
+        self.value = value
+        self.fetched_at = fetched_at
+        self.loader = loader
+
+
+# Der eigentliche Cache.
+# Erwartet: ttl (Sekunden, wie lange ein Eintrag frisch ist), max_entries (wie viele URLs maximal gespeichert werden)
+# und max_stale (Sekunden, wie lange ein abgelaufener Eintrag noch ausgeliefert werden darf, während neu geladen wird).
+# Gibt weiter: get() liefert entweder den gespeicherten Wert (Hit) oder lädt ihn neu über die übergebene Funktion (Miss).
+class CatalogCache:
+    def __init__(self, ttl=300, max_entries=32, max_stale=3600):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_stale = max_stale
+        self.hits = 0            # Zähler: wie oft kam die Antwort frisch aus dem Speicher.
+        self.stale_hits = 0      # Zähler: wie oft wurde eine alte Version ausgeliefert (und im Hintergrund neu geladen).
+        self.misses = 0          # Zähler: wie oft musste blockierend neu geladen werden.
+        self.refreshes = 0       # Zähler: erfolgreiche Hintergrund-Aktualisierungen.
+        self.refresh_errors = 0  # Zähler: fehlgeschlagene Hintergrund-Aktualisierungen.
+        self._entries = OrderedDict()
+        self._refreshing = set() # Keys, die gerade im Hintergrund neu geladen werden (nur ein Refresh pro Key gleichzeitig).
+        self._flight = SingleFlight() # Gleichzeitige Ladevorgänge für denselben Key zusammenfassen.
+        self._lock = threading.Lock()
+        self._scheduler = None
+
+    # Holt den Wert zu 'key'.
+    # - frisch (jünger als ttl): direkt zurückgeben.
+    # - abgelaufen, aber jünger als max_stale: alte Version zurückgeben und im Hintergrund neu laden.
+    # - fehlt oder zu alt: 'loader()' blockierend aufrufen und das Ergebnis speichern.
+    # Fehler im loader (z.B. API nicht erreichbar) werden einfach weitergereicht, damit die Route sie behandeln kann.
+    def get(self, key, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.fetched_at
+                if age < self.ttl:
+                    self.hits += 1
+                    self._entries.move_to_end(key) # Als "zuletzt benutzt" markieren.
+                    return entry.value
+                if age < self.max_stale:
+                    self.stale_hits += 1
+                    self._entries.move_to_end(key)
+                    self._start_refresh(key, loader)
+                    return entry.value
+            self.misses += 1
+
+        return self._load(key, loader) # Außerhalb des Locks laden, damit andere Anfragen nicht blockiert werden.
+
+    # Lädt 'key' über Single-Flight und speichert das Ergebnis. Nur der erste gleichzeitige Aufrufer
+    # ruft wirklich loader() auf, alle anderen teilen sich sein Ergebnis.
+    def _load(self, key, loader):
+        def load_and_store():
+            value = loader()
+            self.put(key, value, loader)
+            return value
+        return self._flight.do(key, load_and_store)
+
+    # Startet einen Hintergrund-Thread, der 'key' neu lädt - aber nur, wenn nicht schon einer läuft.
+    # Muss mit gehaltenem Lock aufgerufen werden.
+    def _start_refresh(self, key, loader):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+
+    # Lädt 'key' neu und speichert das Ergebnis. Fehler werden nur geloggt, die alte Version bleibt dann im Cache.
+    def _refresh(self, key, loader):
+        try:
+            self._load(key, loader)
+        except Exception:
+            logger.exception("Katalog konnte nicht aktualisiert werden: %s", key)
+            with self._lock:
+                self.refresh_errors += 1
+        else:
+            with self._lock:
+                self.refreshes += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    # Startet einen Hintergrund-Thread, der alle gespeicherten Einträge alle 'interval' Sekunden neu lädt.
+    # Ist interval kleiner als ttl, bleiben die Einträge dauerhaft frisch.
+    def start_scheduler(self, interval):
+        if self._scheduler is not None:
+            return # Läuft schon.
+
+        def run():
+            while True:
+                time.sleep(interval)
+                with self._lock:
+                    for key, entry in list(self._entries.items()):
+                        if entry.loader is not None:
+                            self._start_refresh(key, entry.loader)
+
+        self._scheduler = threading.Thread(target=run, name="catalog-refresh", daemon=True)
+        self._scheduler.start()
+
+    # Speichert einen Wert direkt im Cache (z.B. nach dem Laden).
+    def put(self, key, value, loader=None):
+        with self._lock:
+            self._entries[key] = CacheEntry(value, time.monotonic(), loader)
+            self._entries.move_to_end(key)
+            # Wenn zu viele Einträge: den am längsten nicht benutzten rauswerfen.
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # Liefert den zuletzt geladenen Wert zu 'key', egal wie alt (oder None).
+    # Gedacht als Notlösung, wenn die externe API nicht erreichbar ist.
+    def last_known(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.value if entry is not None else None
+
+    # Invalidierung: Einen Eintrag (oder ohne key alle) löschen, damit beim nächsten Zugriff neu geladen wird.
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    # Kennzahlen des Caches als Dictionary, z.B. für eine Debug-Route.
+    def stats(self):
+        flight = self._flight.stats()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "entries": len(self._entries),
+                "ttl": self.ttl,
+                "max_stale": self.max_stale,
+                "max_entries": self.max_entries,
+                "fetches": flight["calls"],
+                "coalesced": flight["coalesced"],
+            }
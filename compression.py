@@ -0,0 +1,106 @@
+# Komprimierung der Antworten (gzip, optional Brotli).
+# Bisher gingen HTML-Seiten, JSON und CSS unkomprimiert über die Leitung. Text lässt sich aber gut komprimieren
+# (meist auf ein Viertel bis ein Fünftel). Zwei Wege:
+# - Statische Dateien: Beim Start werden fertig komprimierte Kopien daneben gelegt ('bundle.css.gz', '.br').
+#   Beim Ausliefern muss dann nichts mehr gerechnet werden.
+# - Dynamische Antworten (render_template, jsonify): werden nach der Route komprimiert, aber nur ab einer
+#   Mindestgröße (kleine Antworten werden durch gzip kaum kleiner, kosten aber trotzdem CPU).
+# Welche Verfahren der Browser versteht, steht im Header 'Accept-Encoding'.
+
+import gzip                          # gzip ist in Python eingebaut.
+import os                            # Dateien und Ordner.
+import threading                     # Für das Lock um die Messwerte.
+import time                          # Für die Messung der CPU-Zeit.
+
+try:
+    import brotli # Optional: komprimiert Text noch etwas besser als gzip. Ohne das Paket wird nur gzip benutzt.
+except ImportError:
+    brotli = None
+
+# Endungen der komprimierten Kopien, in der Reihenfolge, in der sie bevorzugt werden.
+ENCODINGS = (("br", ".br"), ("gzip", ".gz")) if brotli is not None else (("gzip", ".gz"),)
+
+
+# Komprimiert 'data' mit dem Verfahren 'encoding' ('gzip' oder 'br').
+def compress(data, encoding, level=6):
+    if encoding == "br":
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level, mtime=0) # mtime=0: gleiche Eingabe -> gleiche Ausgabe.
+
+
+# Welches der Verfahren will der Browser? Gibt 'br', 'gzip' oder None zurück.
+# 'accept_encodings' ist request.accept_encodings (Werkzeug wertet die q-Werte schon aus).
+def choose_encoding(accept_encodings):
+    for encoding, suffix in ENCODINGS:
+        if accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+# Legt neben jede passende Datei in 'folder' (rekursiv) komprimierte Kopien: 'datei.css.gz' und ggf. 'datei.css.br'.
+# Kopien, die neuer als das Original sind, werden nicht neu gebaut. Dateien unter 'min_size' Bytes werden übersprungen.
+# Kopien, deren Original es nicht mehr gibt (z.B. ein altes CSS-Bundle), werden gelöscht.
+# Gibt weiter: Liste von (Pfad, Bytes Original, {Verfahren: Bytes komprimiert}).
+def precompress_folder(folder, extensions=(".css", ".js", ".svg", ".json", ".html", ".txt"), min_size=256, level=9):
+    results = []
+    for root, _, files in os.walk(folder):
+        for filename in files:
+            if filename.endswith((".gz", ".br")) and filename[:-3] not in files:
+                os.remove(os.path.join(root, filename))
+                continue
+            if not filename.endswith(extensions):
+                continue
+            path = os.path.join(root, filename)
+            size = os.path.getsize(path)
+            if size < min_size:
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            sizes = {}
+            for encoding, suffix in ENCODINGS:
+                target = path + suffix
+                if not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(path):
+                    with open(target, "wb") as f:
+                        f.write(compress(data, encoding, level))
+                sizes[encoding] = os.path.getsize(target)
+            results.append((path, size, sizes))
+    return results
+
+
+# Sammelt Messwerte: wie viele Antworten komprimiert wurden, Bytes vorher/nachher und die dafür gebrauchte CPU-Zeit.
+class CompressionStats:
+    def __init__(self):
+        self.responses = 0     # Zähler: komprimierte dynamische Antworten.
+        self.static_hits = 0   # Zähler: ausgelieferte vorkomprimierte statische Dateien.
+        self.bytes_in = 0      # Bytes vor der Komprimierung.
+        self.bytes_out = 0     # Bytes nach der Komprimierung.
+        self.cpu_seconds = 0.0 # CPU-Zeit für das Komprimieren.
+        self._lock = threading.Lock()
+
+    # Komprimiert 'data' und zählt dabei mit.
+    def compress(self, data, encoding, level):
+        start = time.process_time()
+        result = compress(data, encoding, level)
+        with self._lock:
+            self.responses += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(result)
+            self.cpu_seconds += time.process_time() - start
+        return result
+
+    def record_static(self):
+        with self._lock:
+            self.static_hits += 1
+
+    # Kennzahlen als Dictionary, z.B. für eine Debug-Route.
+    def stats(self):
+        with self._lock:
+            return {
+                "encodings": [encoding for encoding, suffix in ENCODINGS],
+                "responses": self.responses,
+                "static_hits": self.static_hits,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+                "cpu_ms_per_response": round(self.cpu_seconds / self.responses * 1000, 3) if self.responses else None,
+            }
@@ -0,0 +1,77 @@
+# Cache für gerenderte HTML-Schnipsel (Fragmente), z.B. die Produktkarten auf der Favoriten-Seite.
+# Die Favoriten-Seite rendert für jedes gelikte Produkt dieselbe Karte (Bild, Titel, Beschreibung, Unlike-Formular),
+# bei jedem Aufruf neu. Die Karte hängt aber nur von den Produktdaten ab, nicht vom User - deshalb wird das fertige
+# HTML einmal pro Produkt-Stand gespeichert und für alle User wiederverwendet.
+# - Schlüssel: Produkt-ID plus die angezeigten Daten. Ändern sich die Produktdaten (neue Kopie im Like, neuer
+#   Katalog), ist das ein neuer Schlüssel und nur diese Karte wird neu gerendert. Alte Stände fallen per LRU raus.
+# - LRU mit zwei Grenzen: höchstens max_entries Karten und höchstens max_bytes Bytes HTML.
+
+import threading                     # Für das Lock, damit mehrere Anfragen gleichzeitig sicher zugreifen können.
+from collections import OrderedDict  # Für die LRU-Reihenfolge.
+
+
+# Der Cache.
+# Erwartet: max_entries (wie viele Fragmente) und max_bytes (wie viel HTML insgesamt, ungefähr in Bytes).
+# Gibt weiter: get(key, render) liefert das HTML aus dem Speicher oder ruft render() auf und speichert das Ergebnis.
+class FragmentCache:
+    def __init__(self, max_entries=2048, max_bytes=4 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0      # Zähler: aus dem Speicher beantwortet.
+        self.misses = 0    # Zähler: musste gerendert werden.
+        self.evictions = 0 # Zähler: wegen der Grenzen entfernte Fragmente.
+        self.bytes = 0     # Aktuelle Größe aller gespeicherten Fragmente.
+        self._entries = OrderedDict() # key -> HTML (Reihenfolge = LRU)
+        self._lock = threading.Lock()
+
+    # Fragment zu 'key' holen. Ist es nicht im Speicher, wird 'render()' aufgerufen (ohne Lock, damit andere
+    # Anfragen nicht warten müssen) und das Ergebnis gespeichert.
+    def get(self, key, render):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return html
+            self.misses += 1
+        html = render()
+        self._store(key, html)
+        return html
+
+    # Fragment speichern und ältere entfernen, bis beide Grenzen wieder eingehalten sind.
+    # Ein einzelnes Fragment, das allein schon zu groß ist, wird gar nicht gespeichert.
+    def _store(self, key, html):
+        size = len(html)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self._entries[key] = html
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, oldest = self._entries.popitem(last=False)
+                self.bytes -= len(oldest)
+                self.evictions += 1
+
+    # Alles löschen (z.B. nach einer Änderung am Template).
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    # Kennzahlen als Dictionary, z.B. für eine Debug-Route.
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
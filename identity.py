@@ -0,0 +1,132 @@
+# Cache für die Daten eingeloggter User (pro Prozess/Worker).
+# 'profile()', 'favorites()', 'login()' usw. brauchen bei jeder Anfrage den User aus der Datenbank, obwohl sich
+# dessen Daten fast nie ändern. Der Cache hält eine Kopie der User-Daten im Arbeitsspeicher:
+# - LRU: höchstens max_entries User, der am längsten nicht benutzte fliegt raus.
+# - TTL: nach ttl Sekunden wird der User trotzdem neu aus der DB geladen.
+# - Versionsnummer: Jeder User hat in der DB eine 'version', die bei jeder Änderung hochgezählt wird. Die Version
+#   steht auch in der Session. Passt die Version im Cache nicht zur Session, wird neu geladen. So merken auch
+#   andere Worker (mit eigenem Cache) eine Änderung.
+
+import threading                     # Für das Lock, damit mehrere Anfragen gleichzeitig sicher zugreifen können.
+import time                          # Für die TTL.
+from collections import OrderedDict  # Für die LRU-Reihenfolge.
+
+
+# Kopie der User-Daten (keine Datenbank-Zeile), damit sie sicher über mehrere Anfragen hinweg benutzt werden kann.
+# Hat dieselben Attribute wie db_user, die Templates merken also keinen Unterschied.
+class CachedUser:
+    FIELDS = ("_id", "username", "password", "email", "creation", "country", "version")
+
+    def __init__(self, **values):
+        for field in self.FIELDS:
+            setattr(self, field, values.get(field))
+
+    # Kopie aus einer db_user-Zeile erzeugen.
+    @classmethod
+    def from_row(cls, row):
+        return cls(**{field: getattr(row, field) for field in cls.FIELDS})
+
+
+# Ein Cache-Eintrag: der User und wann er geladen wurde.
+class _Entry:
+    def __init__(self, user, loaded_at):
+        self.user = user
+        self.loaded_at = loaded_at
+
+
+# Der Cache.
+# Erwartet: ttl (Sekunden) und max_entries (wie viele User maximal im Speicher sind).
+# Gibt weiter: get_by_username() / get_by_id() liefern einen CachedUser oder None, wenn es den User nicht gibt.
+class IdentityCache:
+    def __init__(self, ttl=60, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0              # Zähler: aus dem Speicher beantwortet.
+        self.misses = 0            # Zähler: musste aus der DB geladen werden.
+        self.version_mismatches = 0 # Zähler: davon, weil die Version nicht zur Session passte.
+        self._by_username = OrderedDict() # username -> _Entry (Reihenfolge = LRU)
+        self._by_id = {}                  # user id -> _Entry (zeigt auf dieselben Einträge)
+        self._lock = threading.Lock()
+
+    # User über den Namen holen. 'loader(username)' lädt ihn aus der DB (CachedUser oder None).
+    # 'version': Versionsnummer aus der Session (None = egal).
+    def get_by_username(self, username, loader, version=None):
+        with self._lock:
+            entry = self._by_username.get(username)
+            if self._usable(entry, version):
+                self.hits += 1
+                self._by_username.move_to_end(username)
+                return entry.user
+            self.misses += 1
+        return self._store(loader(username))
+
+    # User über die ID holen. 'loader(user_id)' lädt ihn aus der DB (CachedUser oder None).
+    def get_by_id(self, user_id, loader, version=None):
+        with self._lock:
+            entry = self._by_id.get(user_id)
+            if self._usable(entry, version):
+                self.hits += 1
+                self._by_username.move_to_end(entry.user.username)
+                return entry.user
+            self.misses += 1
+        return self._store(loader(user_id))
+
+    # Ist der Eintrag noch gültig? Muss mit gehaltenem Lock aufgerufen werden.
+    def _usable(self, entry, version):
+        if entry is None or time.monotonic() - entry.loaded_at >= self.ttl:
+            return False
+        if version is not None and entry.user.version != version:
+            self.version_mismatches += 1
+            return False
+        return True
+
+    # Geladenen User speichern (None = User existiert nicht, wird nicht gespeichert).
+    def _store(self, user):
+        if user is None:
+            return None
+        with self._lock:
+            self._remove(user.username, user._id)
+            entry = _Entry(user, time.monotonic())
+            self._by_username[user.username] = entry
+            self._by_id[user._id] = entry
+            while len(self._by_username) > self.max_entries:
+                _, oldest = self._by_username.popitem(last=False)
+                self._by_id.pop(oldest.user._id, None)
+        return user
+
+    # Entfernt einen User aus beiden Tabellen. Muss mit gehaltenem Lock aufgerufen werden.
+    def _remove(self, username=None, user_id=None):
+        entry = self._by_username.pop(username, None) if username is not None else None
+        if entry is None and user_id is not None:
+            entry = self._by_id.get(user_id)
+            if entry is not None:
+                self._by_username.pop(entry.user.username, None)
+        if entry is not None:
+            self._by_id.pop(entry.user._id, None)
+        if user_id is not None:
+            self._by_id.pop(user_id, None)
+
+    # Invalidierung: User (über Name und/oder ID) aus dem Cache löschen, z.B. nach einer Änderung.
+    def invalidate(self, username=None, user_id=None):
+        with self._lock:
+            self._remove(username, user_id)
+
+    # Alles löschen.
+    def clear(self):
+        with self._lock:
+            self._by_username.clear()
+            self._by_id.clear()
+
+    # Kennzahlen als Dictionary, z.B. für eine Debug-Route.
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "version_mismatches": self.version_mismatches,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "entries": len(self._by_username),
+                "ttl": self.ttl,
+                "max_entries": self.max_entries,
+            }
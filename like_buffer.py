@@ -0,0 +1,159 @@
+# Write-Behind-Puffer für Likes und Unlikes.
+# Normalerweise macht jeder Klick auf "Like" einen eigenen Commit - bei SQLite heißt das: jedes Mal auf die Festplatte
+# schreiben (fsync). Mit dem Puffer landet der Klick erst im Arbeitsspeicher, und ein Hintergrund-Thread schreibt
+# alle gesammelten Änderungen gemeinsam in EINER Transaktion ("Group Commit").
+# - max_delay: spätestens nach so vielen Sekunden wird geschrieben (begrenzte Verzögerung).
+# - max_batch: sind so viele Änderungen gesammelt, wird sofort geschrieben; mehr kommen nie in eine Transaktion.
+# - Mehrere Klicks auf dasselbe Produkt (Like, Unlike, Like) werden zusammengefasst, nur der letzte Stand zählt.
+# - Beim Beenden des Prozesses wird der Rest geschrieben (close()).
+# Lesende Routen fragen mit overlay() bzw. pending_state() den Puffer mit ab, damit der User seine eigenen,
+# noch nicht geschriebenen Klicks sofort sieht.
+
+import logging                       # Für Log-Meldungen, wenn das Schreiben fehlschlägt.
+import threading                     # Für das Lock und den Hintergrund-Thread.
+import time                          # Für die maximale Wartezeit.
+
+logger = logging.getLogger(__name__)
+
+
+# Ein Like, das noch nicht in der DB steht. Hat dieselben Attribute wie eine db_liked_product-Zeile.
+class PendingLike:
+    def __init__(self, username, product_id, product):
+        self.username = username
+        self.product_id = product_id
+        self.product = product
+
+
+# Der Puffer.
+# Erwartet: write_batch(events) - schreibt eine Liste von (username, product_id, title, liked) in einer Transaktion;
+# max_batch und max_delay (Sekunden).
+class LikeWriteBuffer:
+    def __init__(self, write_batch, max_batch=500, max_delay=0.2):
+        self.write_batch = write_batch
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.enqueued = 0       # Zähler: alle Likes/Unlikes, die in den Puffer kamen.
+        self.coalesced = 0      # Zähler: davon mit einer noch wartenden Änderung zusammengefasst.
+        self.flushes = 0        # Zähler: geschriebene Transaktionen.
+        self.flushed_events = 0 # Zähler: in diesen Transaktionen geschriebene Änderungen.
+        self.errors = 0         # Zähler: fehlgeschlagene Transaktionen.
+        self._pending = {}      # (username, product_id) -> (title, liked), noch nicht geschrieben.
+        self._inflight = {}     # Wie _pending, wird aber gerade geschrieben (zählt beim Lesen noch mit).
+        self._first_at = None   # Wann die älteste wartende Änderung kam.
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="like-write-behind", daemon=True)
+        self._thread.start()
+
+    # Like (liked=True) oder Unlike (liked=False) in den Puffer legen.
+    def add(self, username, product_id, title, liked):
+        with self._cond:
+            key = (username, product_id)
+            if key in self._pending:
+                self.coalesced += 1
+            self._pending[key] = (title, liked)
+            self.enqueued += 1
+            if self._first_at is None:
+                self._first_at = time.monotonic()
+            self._cond.notify()
+
+    # Noch nicht geschriebener Stand für ein Produkt: True (gelikt), False (entfernt) oder None (nichts im Puffer).
+    def pending_state(self, username, product_id):
+        with self._cond:
+            key = (username, product_id)
+            entry = self._pending.get(key) or self._inflight.get(key)
+            return entry[1] if entry is not None else None
+
+    # Hat der User noch Änderungen im Puffer (oder gerade in Arbeit)?
+    def has_pending(self, username):
+        with self._cond:
+            return any(name == username for name, product_id in self._pending) or \
+                any(name == username for name, product_id in self._inflight)
+
+    # Nimmt die Likes eines Users aus der DB und rechnet die wartenden Änderungen ein:
+    # entfernte Produkte fallen weg, neue kommen als PendingLike dazu.
+    def overlay(self, username, likes):
+        with self._cond:
+            changes = {product_id: entry for (name, product_id), entry in self._inflight.items() if name == username}
+            changes.update({product_id: entry for (name, product_id), entry in self._pending.items() if name == username})
+        if not changes:
+            return likes
+        result = [like for like in likes if like.product_id not in changes]
+        for product_id, (title, liked) in changes.items():
+            if liked:
+                result.append(PendingLike(username, product_id, title))
+        return result
+
+    # Hintergrund-Thread: wartet auf Änderungen und schreibt sie gesammelt.
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+                # Warten, bis max_batch erreicht ist oder die älteste Änderung max_delay alt ist.
+                while not self._closed and len(self._pending) < self.max_batch:
+                    remaining = self._first_at + self.max_delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                closing = self._closed
+            if closing:
+                return # Den Rest schreibt close().
+            self.flush()
+
+    # Schreibt die ältesten wartenden Änderungen (höchstens max_batch) in einer Transaktion.
+    # Gibt weiter: True, wenn geschrieben wurde (oder nichts zu tun war), False bei einem Fehler.
+    def flush(self):
+        with self._cond:
+            if not self._pending or self._inflight:
+                return True # Nichts zu tun, oder es schreibt gerade schon jemand.
+            keys = list(self._pending)[:self.max_batch] # Dictionaries behalten die Einfügereihenfolge -> älteste zuerst.
+            self._inflight = {key: self._pending.pop(key) for key in keys}
+            if not self._pending:
+                self._first_at = None # Sonst bleibt die alte Zeit, damit der Rest gleich danach geschrieben wird.
+            batch = [(username, product_id, title, liked)
+                     for (username, product_id), (title, liked) in self._inflight.items()]
+        try:
+            self.write_batch(batch)
+        except Exception:
+            logger.exception("Likes konnten nicht gespeichert werden (%d Änderungen)", len(batch))
+            with self._cond:
+                self.errors += 1
+                # Zurück in den Puffer, außer es gibt inzwischen eine neuere Änderung für dasselbe Produkt.
+                for key, entry in self._inflight.items():
+                    self._pending.setdefault(key, entry)
+                if self._pending and self._first_at is None:
+                    self._first_at = time.monotonic()
+                self._inflight = {}
+            return False
+        with self._cond:
+            self.flushes += 1
+            self.flushed_events += len(batch)
+            self._inflight = {}
+        return True
+
+    # Hintergrund-Thread beenden und den Rest schreiben. Wird beim Beenden des Prozesses aufgerufen (atexit).
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=10)
+        while self.stats()["pending"] and self.flush():
+            pass
+
+    # Kennzahlen als Dictionary, z.B. für eine Debug-Route.
+    def stats(self):
+        with self._cond:
+            return {
+                "enqueued": self.enqueued,
+                "coalesced": self.coalesced,
+                "flushes": self.flushes,
+                "flushed_events": self.flushed_events,
+                "avg_batch": round(self.flushed_events / self.flushes, 1) if self.flushes else None,
+                "errors": self.errors,
+                "pending": len(self._pending) + len(self._inflight),
+                "max_batch": self.max_batch,
+                "max_delay": self.max_delay,
+            }
@@ -0,0 +1,127 @@
+# Passwörter hashen und prüfen.
+# Passwörter werden nicht mehr im Klartext gespeichert, sondern als Hash mit zufälligem Salt (scrypt oder PBKDF2
+# aus 'hashlib'). Der gespeicherte Text enthält Verfahren und Kosten-Parameter, z.B.
+#   scrypt$16384$8$1$<salt>$<hash>   oder   pbkdf2_sha256$600000$<salt>$<hash>
+# Werden die Parameter in der Konfiguration erhöht, erkennt needs_rehash() alte Hashes und die App kann beim
+# nächsten Login (dann kennen wir das Passwort ja) einen neuen Hash speichern. Alte Klartext-Passwörter
+# werden genauso behandelt und beim nächsten Login automatisch umgestellt.
+#
+# Hashen kostet absichtlich viel Rechenzeit. Damit viele gleichzeitige Logins nicht alle Worker-Threads belegen,
+# läuft die Arbeit in einem eigenen Thread-Pool mit fester Größe (hashlib gibt dabei das GIL frei).
+# Sind schon zu viele Aufträge in der Warteschlange, wird sofort mit PasswordHasherBusy abgelehnt.
+
+import base64                        # Salt und Hash als Text speichern.
+import hashlib                       # scrypt und pbkdf2_hmac.
+import hmac                          # compare_digest: Vergleich in konstanter Zeit.
+import os                            # os.urandom für das Salt.
+import threading                     # Für das Lock und die Begrenzung der Warteschlange.
+import time                          # Für die Zeitmessung.
+from concurrent.futures import ThreadPoolExecutor  # Der Pool, in dem gehasht wird.
+
+SCRYPT = "scrypt"
+PBKDF2 = "pbkdf2_sha256"
+
+
+# Wird geworfen, wenn die Warteschlange des Pools voll ist. Die Route sollte dann "später nochmal versuchen" melden.
+class PasswordHasherBusy(Exception):
+    pass
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _b64decode(text):
+    return base64.b64decode(text.encode("ascii"))
+
+
+# Der Hasher.
+# Erwartet: algorithm ('scrypt' oder 'pbkdf2_sha256'), die Kosten-Parameter, workers (Größe des Pools)
+# und max_pending (wie viele Aufträge gleichzeitig laufen oder warten dürfen).
+# Gibt weiter: hash() liefert den zu speichernden Text, verify() True/False, needs_rehash() True/False.
+class PasswordHasher:
+    def __init__(self, algorithm=SCRYPT, scrypt_n=2 ** 14, scrypt_r=8, scrypt_p=1, pbkdf2_iterations=600000,
+                 workers=2, max_pending=16, wait_timeout=5):
+        if algorithm not in (SCRYPT, PBKDF2):
+            raise ValueError(f"Unbekanntes Hash-Verfahren: {algorithm}")
+        self.algorithm = algorithm
+        self.scrypt_n = scrypt_n
+        self.scrypt_r = scrypt_r
+        self.scrypt_p = scrypt_p
+        self.pbkdf2_iterations = pbkdf2_iterations
+        self.workers = workers
+        self.max_pending = max_pending
+        self.wait_timeout = wait_timeout # Sekunden, die auf einen freien Platz in der Warteschlange gewartet wird.
+        self.hashes = 0     # Zähler: berechnete Hashes (hash() und verify()).
+        self.rejected = 0   # Zähler: abgelehnt, weil die Warteschlange voll war.
+        self._seconds = 0.0 # Summe der Rechenzeit, für den Durchschnitt.
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+
+    # Neuen Hash mit den aktuellen Parametern und zufälligem Salt erzeugen.
+    def hash(self, password):
+        salt = os.urandom(16)
+        if self.algorithm == SCRYPT:
+            params = (self.scrypt_n, self.scrypt_r, self.scrypt_p)
+            digest = self._run(_scrypt, password, salt, *params)
+            return "$".join([SCRYPT, *map(str, params), _b64encode(salt), _b64encode(digest)])
+        digest = self._run(_pbkdf2, password, salt, self.pbkdf2_iterations)
+        return "$".join([PBKDF2, str(self.pbkdf2_iterations), _b64encode(salt), _b64encode(digest)])
+
+    # Passt 'password' zum gespeicherten Text? Versteht beide Verfahren (egal welches gerade eingestellt ist)
+    # und alte Klartext-Passwörter.
+    def verify(self, password, stored):
+        parts = stored.split("$")
+        if parts[0] == SCRYPT and len(parts) == 6:
+            n, r, p = map(int, parts[1:4])
+            digest = self._run(_scrypt, password, _b64decode(parts[4]), n, r, p)
+            return hmac.compare_digest(digest, _b64decode(parts[5]))
+        if parts[0] == PBKDF2 and len(parts) == 4:
+            digest = self._run(_pbkdf2, password, _b64decode(parts[2]), int(parts[1]))
+            return hmac.compare_digest(digest, _b64decode(parts[3]))
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8")) # Altes Klartext-Passwort.
+
+    # Wurde der gespeicherte Text mit anderen Parametern (oder gar nicht) gehasht als gerade eingestellt?
+    def needs_rehash(self, stored):
+        parts = stored.split("$")
+        if self.algorithm == SCRYPT:
+            return parts[:4] != [SCRYPT, str(self.scrypt_n), str(self.scrypt_r), str(self.scrypt_p)] or len(parts) != 6
+        return parts[:2] != [PBKDF2, str(self.pbkdf2_iterations)] or len(parts) != 4
+
+    # Führt fn(*args) im Pool aus und wartet auf das Ergebnis.
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy("Zu viele gleichzeitige Passwort-Prüfungen")
+        try:
+            start = time.perf_counter()
+            result = self._pool.submit(fn, *args).result()
+            with self._lock:
+                self.hashes += 1
+                self._seconds += time.perf_counter() - start
+            return result
+        finally:
+            self._slots.release()
+
+    # Kennzahlen als Dictionary, z.B. für eine Debug-Route.
+    def stats(self):
+        with self._lock:
+            return {
+                "algorithm": self.algorithm,
+                "hashes": self.hashes,
+                "rejected": self.rejected,
+                "avg_ms": round(self._seconds / self.hashes * 1000, 2) if self.hashes else None,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+            }
+
+
+def _scrypt(password, salt, n, r, p):
+    maxmem = 128 * r * (n + p + 2) + 1024 * 1024 # Speicherbedarf von scrypt plus etwas Reserve (sonst gilt OpenSSLs 32-MB-Grenze).
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=maxmem, dklen=32)
+
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
@@ -0,0 +1,377 @@
+# Serverseitige Sessions.
+# Flask speichert die Session standardmäßig komplett im Cookie (signiert, aber lesbar). Bei vielen Likes wird
+# 'liked_products' dadurch mehrere KB groß und wird bei JEDER Anfrage vom Browser mitgeschickt - irgendwann
+# stößt man an das 4KB-Limit für Cookies.
+# Hier liegt stattdessen nur eine (signierte) Session-ID im Cookie, die eigentlichen Daten liegen auf dem Server:
+# - SqliteSessionStore: in einer Tabelle der SQLite-Datenbank (Standard).
+# - RedisSessionStore: in Redis (oder einem Redis-kompatiblen Ersatz wie LocalRedis, z.B. zum Testen ohne Redis-Server).
+# Wer die Session im Cookie behalten will, kann mit CompactCookieSessionInterface wenigstens ein kleineres Cookie bekommen.
+# CookieSizeTracker misst bei jeder Antwort, wie groß die gesetzten Cookies sind.
+
+import logging                            # Für die Warnung, wenn ein Cookie zu groß wird.
+import secrets                            # Für zufällige, nicht erratbare Session-IDs.
+import threading                          # Für das Lock in LocalRedis und CookieSizeTracker.
+import time                               # Für Ablaufzeiten.
+
+from flask.json.tag import JSONTag, TaggedJSONSerializer
+from flask.sessions import SecureCookieSessionInterface, SessionInterface, SessionMixin, session_json_serializer
+from itsdangerous import BadSignature, Signer # Signiert die Session-ID, damit niemand fremde IDs ausprobieren kann.
+from sqlalchemy import text
+from werkzeug.datastructures import CallbackDict
+
+try:
+    import redis # Optional: nur nötig, wenn wirklich ein Redis-Server benutzt wird.
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+# Das Session-Objekt: verhält sich wie ein Dictionary und merkt sich, ob es verändert und ob es gelesen wurde.
+# 'accessed' wie bei Flasks SecureCookieSession: Nur wenn die Route die Session wirklich liest, hängt die Antwort
+# vom Cookie ab (Vary: Cookie). Antworten, die die Session nicht anfassen, bleiben für geteilte Caches cachebar.
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.accessed = False
+        self.previous_sid = None # Alte ID nach regenerate(), wird beim Speichern aus dem Store gelöscht.
+
+    # Neue, zufällige Session-ID vergeben (beim Login und Logout, gegen Session-Fixation): Eine vorher
+    # untergeschobene ID wird so nie zu einer eingeloggten Session. Die Daten bleiben erhalten.
+    def regenerate(self):
+        if self.previous_sid is None:
+            self.previous_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.modified = True
+        self.accessed = True
+
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        self.accessed = True
+        return super().__contains__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+
+# Speichert Sessions in einer Tabelle der SQLite-Datenbank.
+# Erwartet: eine Funktion, die die SQLAlchemy-Engine liefert (wird erst bei Bedarf aufgerufen, weil
+# 'db.engine' einen App-Kontext braucht).
+class SqliteSessionStore:
+    def __init__(self, get_engine, table="session_store"):
+        self.get_engine = get_engine
+        self.table = table
+        self._created = False
+
+    # Tabelle beim ersten Zugriff anlegen.
+    def _engine(self):
+        engine = self.get_engine()
+        if not self._created:
+            with engine.begin() as connection:
+                connection.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {self.table} "
+                    "(sid VARCHAR(64) PRIMARY KEY, data BLOB NOT NULL, expires_at FLOAT NOT NULL)"))
+                connection.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{self.table}_expires_at ON {self.table} (expires_at)"))
+            self._created = True
+        return engine
+
+    # Gespeicherte Daten zu 'sid' holen (oder None, wenn es sie nicht gibt oder sie abgelaufen sind).
+    def get(self, sid):
+        with self._engine().connect() as connection:
+            row = connection.execute(
+                text(f"SELECT data FROM {self.table} WHERE sid = :sid AND expires_at > :now"),
+                {"sid": sid, "now": time.time()},
+            ).first()
+        return row[0] if row else None
+
+    # Daten speichern bzw. überschreiben. 'ttl' = Sekunden bis zum Ablauf.
+    def set(self, sid, data, ttl):
+        with self._engine().begin() as connection:
+            connection.execute(
+                text(f"INSERT INTO {self.table} (sid, data, expires_at) VALUES (:sid, :data, :expires_at) "
+                     "ON CONFLICT(sid) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at"),
+                {"sid": sid, "data": data, "expires_at": time.time() + ttl},
+            )
+
+    # Session löschen (z.B. beim Logout, wenn die Session leer ist).
+    def delete(self, sid):
+        with self._engine().begin() as connection:
+            connection.execute(text(f"DELETE FROM {self.table} WHERE sid = :sid"), {"sid": sid})
+
+    # Abgelaufene Sessions aufräumen. Gibt die Anzahl gelöschter Einträge zurück.
+    def purge_expired(self):
+        with self._engine().begin() as connection:
+            result = connection.execute(text(f"DELETE FROM {self.table} WHERE expires_at <= :now"), {"now": time.time()})
+        return result.rowcount
+
+
+# Speichert Sessions in Redis. Erwartet einen Client mit get(), setex() und delete() - also redis.Redis
+# oder den Ersatz LocalRedis. Redis löscht abgelaufene Einträge selbst.
+class RedisSessionStore:
+    def __init__(self, client, prefix="session:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, sid):
+        return self.client.get(self.prefix + sid)
+
+    def set(self, sid, data, ttl):
+        self.client.setex(self.prefix + sid, int(ttl), data)
+
+    def delete(self, sid):
+        self.client.delete(self.prefix + sid)
+
+    def purge_expired(self):
+        return 0
+
+
+# Minimaler Redis-Ersatz im Arbeitsspeicher (get/setex/delete mit Ablaufzeit).
+# Gedacht für Entwicklung und Tests, wenn kein Redis-Server läuft. Daten gehen beim Neustart verloren.
+class LocalRedis:
+    def __init__(self):
+        self._data = {} # key -> (Wert, Ablaufzeitpunkt)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[1] <= time.time():
+                del self._data[key]
+                return None
+            return item[0]
+
+    def setex(self, key, seconds, value):
+        with self._lock:
+            self._data[key] = (value, time.time() + seconds)
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+
+# Verbindet Flask mit einem der Stores oben.
+# Im Cookie steht nur "<session-id>.<signatur>", die Daten werden mit Flasks eigenem JSON-Serializer gespeichert
+# (kann auch Datumswerte, Tupel usw.).
+# Abgelaufene Sessions werden beim Speichern aufgeräumt, höchstens alle 'purge_interval' Sekunden (None = nie).
+class ServerSideSessionInterface(SessionInterface):
+    serializer = session_json_serializer
+
+    def __init__(self, store, salt="server-side-session", purge_interval=300):
+        self.store = store
+        self.salt = salt
+        self.purge_interval = purge_interval
+        self._next_purge = time.monotonic() + purge_interval if purge_interval else None
+        self._purge_lock = threading.Lock()
+
+    # Abgelaufene Sessions löschen, wenn 'purge_interval' seit dem letzten Mal vergangen ist.
+    # Nur ein Thread räumt auf, die anderen warten nicht darauf.
+    def _purge_if_due(self):
+        if self._next_purge is None or time.monotonic() < self._next_purge:
+            return
+        if not self._purge_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_purge = time.monotonic() + self.purge_interval
+            purged = self.store.purge_expired()
+            if purged:
+                logger.info("%s abgelaufene Sessions gelöscht", purged)
+        except Exception:
+            logger.exception("Abgelaufene Sessions konnten nicht gelöscht werden")
+        finally:
+            self._purge_lock.release()
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt)
+
+    # Wird von Flask am Anfang jeder Anfrage aufgerufen: Session-ID aus dem Cookie lesen und Daten laden.
+    # Statische Dateien brauchen die Session nicht - dafür wird der Store gar nicht erst gefragt
+    # (leere Session, die beim Speichern nichts tut).
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None # Ohne Secret Key keine Session (wie bei Flasks Standard-Sessions).
+        if app.static_url_path and request.path.startswith(app.static_url_path + "/"):
+            return ServerSideSession()
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode()
+            except BadSignature:
+                sid = None # Manipuliertes Cookie -> neue Session.
+            if sid:
+                data = self.store.get(sid)
+                if data is not None:
+                    return ServerSideSession(self.serializer.loads(data), sid=sid)
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    # Wird von Flask am Ende jeder Anfrage aufgerufen: geänderte Daten speichern und Cookie setzen.
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add("Cookie") # Die Antwort hängt vom Cookie ab, darf also nicht geteilt gecacht werden.
+
+        if session.previous_sid is not None:
+            self.store.delete(session.previous_sid) # ID wurde mit regenerate() ersetzt.
+
+        # Session ist leer (z.B. nach dem Logout) -> Daten und Cookie löschen.
+        if not session:
+            if session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app), httponly=self.get_cookie_httponly(app),
+                                       samesite=self.get_cookie_samesite(app), partitioned=self.get_cookie_partitioned(app))
+            return
+
+        if not self.should_set_cookie(app, session):
+            return
+
+        self.store.set(session.sid, self.serializer.dumps(dict(session)),
+                       app.permanent_session_lifetime.total_seconds())
+        self._purge_if_due()
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid).decode(),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+            partitioned=self.get_cookie_partitioned(app),
+        )
+
+
+# Zahl <-> Text zur Basis 36 (0-9, a-z), kürzer als normale Dezimalzahlen.
+def _to_base36(number):
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    sign = "-" if number < 0 else ""
+    number = abs(number)
+    text = ""
+    while True:
+        number, rest = divmod(number, 36)
+        text = digits[rest] + text
+        if not number:
+            return sign + text
+
+
+# Eigener "Tag" für Flasks Session-JSON: Listen aus ganzen Zahlen (z.B. 'liked_products' mit Produkt-IDs)
+# werden als Differenzen zur Basis 36 gespeichert: [1, 2, 3, 10] -> "1.1.1.7" statt "[1,2,3,10]".
+# Die Reihenfolge bleibt erhalten. Die vielen gleichen Differenzen lassen sich danach sehr gut komprimieren.
+class TagIntList(JSONTag):
+    __slots__ = ()
+    key = " il"
+
+    def check(self, value):
+        return isinstance(value, list) and bool(value) and all(type(item) is int for item in value)
+
+    def to_json(self, value):
+        previous = 0
+        parts = []
+        for item in value:
+            parts.append(_to_base36(item - previous))
+            previous = item
+        return ".".join(parts)
+
+    def to_python(self, value):
+        result = []
+        current = 0
+        for part in value.split("."):
+            current += int(part, 36)
+            result.append(current)
+        return result
+
+
+# Serializer für die kompakte Cookie-Session: Flasks JSON (kann auch Datum, Tupel usw.) plus TagIntList.
+# itsdangerous komprimiert das Ergebnis danach zusätzlich mit zlib, wenn es dadurch kürzer wird.
+compact_session_serializer = TaggedJSONSerializer()
+compact_session_serializer.register(TagIntList, index=0) # Vor den Standard-Tags prüfen, sonst greift der normale Listen-Tag.
+
+
+# Session weiterhin im Cookie (wie Flasks Standard), aber mit compact_session_serializer -> kleineres Cookie.
+# Eigenes Salt, damit alte Standard-Cookies nicht versehentlich mit dem falschen Format gelesen werden.
+class CompactCookieSessionInterface(SecureCookieSessionInterface):
+    salt = "compact-cookie-session"
+    serializer = compact_session_serializer
+
+
+# Misst die Größe aller Set-Cookie-Header einer Antwort und warnt, wenn ein Cookie größer als 'budget' Bytes ist.
+# Browser akzeptieren meist nur ca. 4KB pro Cookie, darüber wird das Cookie stillschweigend verworfen.
+class CookieSizeTracker:
+    def __init__(self, budget=3072):
+        self.budget = budget
+        self.responses = 0   # Zähler: Antworten, die ein Cookie gesetzt haben.
+        self.over_budget = 0 # Zähler: davon über dem Budget.
+        self.total_bytes = 0
+        self.max_bytes = 0
+        self.last_bytes = 0
+        self._lock = threading.Lock()
+
+    # Nach jeder Antwort aufrufen, wenn die Cookies schon gesetzt sind. Gibt die Antwort unverändert zurück.
+    def record(self, response, path=None):
+        sizes = [len(header) for header in response.headers.getlist("Set-Cookie")]
+        if not sizes:
+            return response
+        size = max(sizes)
+        with self._lock:
+            self.responses += 1
+            self.total_bytes += sum(sizes)
+            self.max_bytes = max(self.max_bytes, size)
+            self.last_bytes = size
+            if size > self.budget:
+                self.over_budget += 1
+        if size > self.budget:
+            logger.warning("Set-Cookie ist %s Bytes groß (Budget: %s Bytes) bei %s", size, self.budget, path)
+        return response
+
+    # Kennzahlen als Dictionary.
+    def stats(self):
+        with self._lock:
+            return {
+                "budget": self.budget,
+                "responses": self.responses,
+                "over_budget": self.over_budget,
+                "avg_bytes": round(self.total_bytes / self.responses, 1) if self.responses else 0,
+                "max_bytes": self.max_bytes,
+                "last_bytes": self.last_bytes,
+            }
+
+
+# Baut das passende Session-Interface zur Konfiguration.
+# Erwartet: backend ('sqlite', 'redis', 'compact' oder 'cookie'), eine Funktion für die DB-Engine, optional eine Redis-URL
+# und wie oft (Sekunden) abgelaufene Sessions aufgeräumt werden.
+# Gibt weiter: ein SessionInterface für 'app.session_interface' (oder None = Flasks Standard-Cookie-Session).
+def create_session_interface(backend, get_engine, redis_url=None, purge_interval=300):
+    if backend == "cookie":
+        return None
+    if backend == "compact":
+        return CompactCookieSessionInterface()
+    if backend == "sqlite":
+        return ServerSideSessionInterface(SqliteSessionStore(get_engine), purge_interval=purge_interval)
+    if backend == "redis":
+        if redis_url:
+            if redis is None:
+                raise RuntimeError("SESSION_REDIS_URL ist gesetzt, aber das Paket 'redis' ist nicht installiert")
+            client = redis.Redis.from_url(redis_url)
+        else:
+            client = LocalRedis() # Kein Server angegeben -> Ersatz im Arbeitsspeicher.
+        return ServerSideSessionInterface(RedisSessionStore(client))
+    raise ValueError(f"Unbekanntes SESSION_BACKEND: {backend}")
@@ -0,0 +1,16 @@
+# Gemeinsame Einstellungen für die Tests: Das Projektverzeichnis (mit app.py) muss importierbar sein.
+# Die Tests benutzen eine eigene SQLite-Datei in einem temporären Ordner und schreiben nichts in den Projektordner
+# (keine Bundles, keine komprimierten Kopien). Die Umgebungsvariablen müssen gesetzt sein, bevor app.py importiert wird.
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp(prefix="flask-tests-")
+atexit.register(shutil.rmtree, _tmp_dir, ignore_errors=True)
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_tmp_dir, "test.db")
+os.environ["ASSET_BUILD_ON_STARTUP"] = "0"
+os.environ["PRECOMPRESS_STATIC_ON_STARTUP"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
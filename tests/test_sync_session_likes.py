@@ -0,0 +1,55 @@
+# Test für sync_session_likes(): Die Anzahl der SQL-Anweisungen darf nicht von der Anzahl der Likes abhängen
+# (eine Abfrage für die vorhandenen Likes, ein INSERT als executemany, ein Commit).
+# Benutzt die temporäre Test-Datenbank aus conftest.py mit einem eigenen Test-User, der danach wieder gelöscht wird.
+
+import pytest
+from sqlalchemy import event
+
+import app as app_module
+from catalog import Catalog
+
+USERNAME = "__test_sync_session_likes"
+PRODUCTS = [{"id": i, "title": f"Testprodukt {i}", "description": f"Beschreibung {i}",
+             "thumbnail": f"https://example.com/{i}.png", "price": float(i)} for i in range(1, 41)]
+
+
+# App-Kontext mit Tabellen und einem Test-Katalog im Cache (damit keine Anfrage an die externe API geht).
+@pytest.fixture
+def app_context():
+    with app_module.app.app_context():
+        app_module.db.create_all()
+        app_module.catalog_cache.put(app_module.PRODUCTS_URL, Catalog(PRODUCTS))
+        yield
+        app_module.db_liked_product.query.filter_by(username=USERNAME).delete()
+        app_module.db.session.commit()
+        app_module.catalog_cache.invalidate(app_module.PRODUCTS_URL)
+
+
+# Führt sync_session_likes() für 'count' Likes aus (ohne vorhandene Likes) und zählt die SQL-Anweisungen.
+def count_statements(count):
+    app_module.db_liked_product.query.filter_by(username=USERNAME).delete()
+    app_module.db.session.commit()
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = app_module.db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        app_module.sync_session_likes(USERNAME, [product["id"] for product in PRODUCTS[:count]])
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert app_module.db_liked_product.query.filter_by(username=USERNAME).count() == count
+    return len(statements)
+
+
+def test_sync_session_likes_uses_constant_number_of_statements(app_context):
+    assert count_statements(5) == count_statements(40)
+
+
+def test_sync_session_likes_skips_likes_already_stored(app_context):
+    count_statements(5)
+    ids = [product["id"] for product in PRODUCTS[:5]]
+    app_module.sync_session_likes(USERNAME, ids)
+    assert app_module.db_liked_product.query.filter_by(username=USERNAME).count() == 5
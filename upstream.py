@@ -0,0 +1,188 @@
+# Gemeinsamer HTTP-Client für alle serverseitigen Anfragen an externe APIs (hier dummyjson.com).
+# Statt für jede Anfrage 'requests.get' aufzurufen (jedes Mal neue TCP- und TLS-Verbindung, kein Timeout),
+# benutzt der Client eine 'requests.Session' mit Verbindungs-Pool (Keep-Alive), festen Timeouts
+# und einer begrenzten Anzahl an Wiederholungen mit Wartezeit (Backoff).
+# Zusätzlich wird die Dauer jedes Aufrufs gemessen, damit man sieht, wie langsam die externe API ist.
+#
+# Ein "Circuit Breaker" (Sicherung) schützt die App, wenn die externe API langsam oder kaputt ist:
+# Schlagen zu viele Aufrufe fehl, "fliegt die Sicherung raus" (open) und weitere Aufrufe scheitern sofort,
+# statt Worker minutenlang warten zu lassen. Nach einer Abkühlzeit wird ein einzelner Testaufruf erlaubt (half-open);
+# klappt er, ist die Sicherung wieder drin (closed), sonst bleibt sie draußen.
+
+import threading                      # Für das Lock um die Messwerte.
+import time                           # Für die Zeitmessung der Aufrufe.
+from collections import deque         # Liste mit fester Länge für die letzten Messwerte.
+
+import requests
+from requests.adapters import HTTPAdapter # Adapter, über den man Pool-Größe und Retries einstellt.
+from urllib3.util.retry import Retry      # Regelt, wann und wie oft eine fehlgeschlagene Anfrage wiederholt wird.
+
+
+# Wird geworfen, wenn die Sicherung offen ist und der Aufruf deshalb gar nicht erst gemacht wird.
+# Erbt von RequestException, damit bestehende 'except requests.exceptions.RequestException' sie mit abfangen.
+class CircuitOpenError(requests.exceptions.RequestException):
+    pass
+
+
+# Die Sicherung.
+# Erwartet: failure_threshold (Fehlerquote 0..1, ab der geöffnet wird), window (wie viele letzte Aufrufe zählen),
+# min_calls (Mindestanzahl Aufrufe im Fenster, bevor die Quote zählt) und cooldown (Sekunden bis zum Testaufruf).
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=0.5, window=20, min_calls=5, cooldown=30):
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.opened = 0    # Zähler: wie oft die Sicherung rausgeflogen ist.
+        self.rejected = 0  # Zähler: wie viele Aufrufe sofort abgelehnt wurden.
+        self._results = deque(maxlen=window) # True = Erfolg, False = Fehler.
+        self._opened_at = 0.0
+        self._trial_running = False # Im Zustand half-open darf nur ein Testaufruf gleichzeitig laufen.
+        self._lock = threading.Lock()
+
+    # Vor jedem Aufruf: prüft, ob der Aufruf erlaubt ist. Wirft CircuitOpenError, wenn nicht.
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN # Abkühlzeit vorbei -> einen Testaufruf erlauben.
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError("Externe API vorübergehend deaktiviert (Circuit Breaker offen)")
+
+    # Nach einem erfolgreichen Aufruf.
+    def record_success(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED # Testaufruf hat geklappt -> wieder normal arbeiten.
+                self._trial_running = False
+                self._results.clear()
+            self._results.append(True)
+
+    # Nach einem fehlgeschlagenen Aufruf.
+    def record_failure(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial_running = False
+                self._open()
+                return
+            self._results.append(False)
+            failures = self._results.count(False)
+            if len(self._results) >= self.min_calls and failures / len(self._results) >= self.failure_threshold:
+                self._open()
+
+    # Sicherung öffnen. Muss mit gehaltenem Lock aufgerufen werden.
+    def _open(self):
+        self.state = self.OPEN
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        self._results.clear()
+
+    # Kennzahlen als Dictionary.
+    def stats(self):
+        with self._lock:
+            failures = self._results.count(False)
+            return {
+                "state": self.state,
+                "failure_rate": round(failures / len(self._results), 2) if self._results else 0.0,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+
+# Zählt ein Fehler für die Sicherung? Nur wenn die API selbst Probleme hat (Timeout, Verbindung, 5xx, 429),
+# nicht bei Fehlern, die an unserer Anfrage liegen (andere 4xx).
+def _is_upstream_failure(error):
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500 or error.response.status_code == 429
+    return True
+
+
+# Der Client.
+# Erwartet: Pool-Größe, Timeouts (Sekunden) für Verbindungsaufbau und Antwort, Anzahl Wiederholungen und Backoff-Faktor,
+# optional eine Sicherung (CircuitBreaker).
+# Gibt weiter: get_json() liefert die geparste JSON-Antwort oder wirft eine requests-Exception.
+class UpstreamClient:
+    def __init__(self, pool_size=10, connect_timeout=3.05, read_timeout=10, retries=2, backoff=0.3, sample_size=200,
+                 breaker=None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,                     # Wartezeit zwischen den Versuchen: backoff * 2^(Versuch-1)
+            status_forcelist=(429, 500, 502, 503, 504), # Bei diesen Statuscodes nochmal versuchen.
+            allowed_methods=frozenset(["GET"]),         # Nur lesende Anfragen wiederholen.
+            raise_on_status=False,                      # Nach dem letzten Versuch die Antwort zurückgeben, raise_for_status() meldet den Fehler.
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.calls = 0   # Zähler: alle Aufrufe.
+        self.errors = 0  # Zähler: fehlgeschlagene Aufrufe.
+        self._latencies = deque(maxlen=sample_size) # Dauer der letzten Aufrufe in Sekunden.
+        self._lock = threading.Lock()
+
+    # GET-Anfrage an 'url' und JSON-Antwort zurückgeben.
+    # Wirft requests.exceptions.RequestException bei Timeout, Verbindungsfehler oder schlechtem Statuscode,
+    # und CircuitOpenError sofort, wenn die Sicherung offen ist.
+    def get_json(self, url, params=None):
+        if self.breaker is not None:
+            self.breaker.before_call()
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            response.raise_for_status() # Fehler werfen, wenn HTTP-Statuscode schlecht ist.
+            data = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self._record(time.perf_counter() - start, failed=True)
+            if self.breaker is not None:
+                if _is_upstream_failure(e):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success() # Die API hat geantwortet, nur unsere Anfrage war falsch.
+            raise
+        except Exception:
+            # Jeder andere Fehler zählt auch als Fehlschlag - sonst bliebe ein Testaufruf im Zustand half-open
+            # für immer "laufend" und die Sicherung würde jeden weiteren Aufruf ablehnen.
+            self._record(time.perf_counter() - start, failed=True)
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            raise
+        self._record(time.perf_counter() - start, failed=False)
+        if self.breaker is not None:
+            self.breaker.record_success()
+        return data
+
+    # Speichert die Dauer eines Aufrufs.
+    def _record(self, duration, failed):
+        with self._lock:
+            self.calls += 1
+            if failed:
+                self.errors += 1
+            self._latencies.append(duration)
+
+    # Kennzahlen als Dictionary (Dauer in Millisekunden), z.B. für eine Debug-Route.
+    def stats(self):
+        with self._lock:
+            samples = sorted(self._latencies)
+            calls, errors = self.calls, self.errors
+        result = {"calls": calls, "errors": errors}
+        if self.breaker is not None:
+            result["circuit"] = self.breaker.stats()
+        if samples:
+            result["latency_ms"] = {
+                "avg": round(sum(samples) / len(samples) * 1000, 2),
+                "p50": round(samples[len(samples) // 2] * 1000, 2),
+                "p95": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 2),
+                "max": round(samples[-1] * 1000, 2),
+            }
+        return result